@@ -2,12 +2,15 @@ from django.contrib import admin
 from django.contrib.auth.models import Group
 from django.utils.html import format_html
 from django.utils import timezone
+from .catalog import bump_catalog_version
+from .reminder_index import sync_habit_reminders
 from .models import (
     Category,
     Habit,
     HabitCompletion,
     HabitCopy,
     HabitShare,
+    LeaderboardSnapshot,
     Payment,
     Product,
     Quest,
@@ -20,6 +23,19 @@ from .models import (
 admin.site.unregister(Group)
 
 
+class CatalogCacheAdminMixin:
+    actions = ("reset_catalog_cache",)
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        bump_catalog_version()
+
+    @admin.action(description="Сбросить кэш каталога")
+    def reset_catalog_cache(self, request, queryset):
+        bump_catalog_version()
+        self.message_user(request, "Кэш каталога сброшен")
+
+
 
 
 
@@ -94,7 +110,7 @@ class UserAdmin(admin.ModelAdmin):
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(CatalogCacheAdminMixin, admin.ModelAdmin):
     list_display = (
         "name",
         "price",
@@ -121,7 +137,7 @@ class PaymentAdmin(admin.ModelAdmin):
 
 
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(CatalogCacheAdminMixin, admin.ModelAdmin):
     list_display = ("name", "created_at")
     search_fields = ("name",)
     readonly_fields = ("created_at",)
@@ -134,6 +150,10 @@ class HabitAdmin(admin.ModelAdmin):
     search_fields = ("title", "owner__username", "owner__first_name", "owner__telegram_id")
     readonly_fields = ("created_at", "updated_at")
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        sync_habit_reminders(obj)
+
 
 @admin.register(HabitCompletion)
 class HabitCompletionAdmin(admin.ModelAdmin):
@@ -153,7 +173,7 @@ class HabitCopyAdmin(admin.ModelAdmin):
 
 
 @admin.register(Quest)
-class QuestAdmin(admin.ModelAdmin):
+class QuestAdmin(CatalogCacheAdminMixin, admin.ModelAdmin):
     list_display = ("title", "group", "type", "xp", "target", "is_active", "order")
     list_filter = ("group", "type", "is_active")
     search_fields = ("title", "code")
@@ -161,7 +181,7 @@ class QuestAdmin(admin.ModelAdmin):
 
 
 @admin.register(Title)
-class TitleAdmin(admin.ModelAdmin):
+class TitleAdmin(CatalogCacheAdminMixin, admin.ModelAdmin):
     list_display = ("name", "level_min", "level_max", "requires_premium", "order")
     list_filter = ("requires_premium",)
     search_fields = ("name", "code")
@@ -178,11 +198,18 @@ class UserQuestAdmin(admin.ModelAdmin):
 
 @admin.register(XpTransaction)
 class XpTransactionAdmin(admin.ModelAdmin):
-    list_display = ("user", "week_start", "week_end", "xp", "created_at")
+    list_display = ("user", "week_start", "week_end", "xp", "rank", "created_at")
     list_filter = ("week_start", "week_end")
     search_fields = ("user__username", "user__first_name", "user__telegram_id")
     readonly_fields = ("created_at",)
 
+
+@admin.register(LeaderboardSnapshot)
+class LeaderboardSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("range_key", "period_start", "period_end", "participants", "created_at")
+    list_filter = ("range_key",)
+    readonly_fields = ("created_at",)
+
 """
 @admin.register(HabitShare)
 class HabitShareAdmin(admin.ModelAdmin):
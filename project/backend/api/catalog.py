@@ -0,0 +1,107 @@
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Category, Product, Quest, Title
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = "catalog:version"
+CATALOG_VERSION_CHECK_SECONDS = 5
+
+_lock = threading.Lock()
+_state: dict = {"version": None, "checked_at": 0.0, "items": {}}
+
+
+def _read_shared_version():
+    try:
+        version = cache.get(CATALOG_VERSION_KEY)
+        if version is None:
+            # Seed from the clock so a lost key never reuses an old counter value.
+            cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), timeout=None)
+            version = cache.get(CATALOG_VERSION_KEY)
+        return version
+    except Exception:
+        return None
+
+
+def _current_items() -> dict:
+    now = time.monotonic()
+    with _lock:
+        if now - _state["checked_at"] < CATALOG_VERSION_CHECK_SECONDS:
+            return _state["items"]
+    version = _read_shared_version()
+    with _lock:
+        if version is None or version != _state["version"]:
+            _state["version"] = version
+            _state["items"] = {}
+        _state["checked_at"] = now
+        return _state["items"]
+
+
+def _snapshot(kind: str, loader):
+    items = _current_items()
+    value = items.get(kind)
+    if value is None:
+        value = loader()
+        with _lock:
+            if _state["items"] is items:
+                items[kind] = value
+    return value
+
+
+def _drop_local_snapshot() -> None:
+    with _lock:
+        _state["version"] = None
+        _state["checked_at"] = 0.0
+        _state["items"] = {}
+
+
+def _bump_now() -> None:
+    try:
+        if not cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), timeout=None):
+            cache.incr(CATALOG_VERSION_KEY)
+    except Exception as exc:
+        logger.warning("Failed to bump catalog version: %s", exc)
+    _drop_local_snapshot()
+
+
+def bump_catalog_version() -> None:
+    transaction.on_commit(_bump_now)
+
+
+def get_titles() -> tuple[Title, ...]:
+    return _snapshot("titles", lambda: tuple(Title.objects.all().order_by("order", "id")))
+
+
+def get_title(title_id: int | None) -> Title | None:
+    if not title_id:
+        return None
+    titles_by_id = _snapshot("titles_by_id", lambda: {title.id: title for title in get_titles()})
+    return titles_by_id.get(title_id)
+
+
+def get_active_quests() -> tuple[Quest, ...]:
+    return _snapshot("quests", lambda: tuple(Quest.objects.filter(is_active=True).order_by("group", "order", "id")))
+
+
+def _build_quest_group_requirements() -> dict[str, frozenset[int]]:
+    groups: dict[str, set[int]] = {}
+    for quest in get_active_quests():
+        groups.setdefault(quest.group, set()).add(quest.id)
+    return {group: frozenset(ids) for group, ids in groups.items()}
+
+
+def get_quest_group_requirements() -> dict[str, frozenset[int]]:
+    return _snapshot("quest_groups", _build_quest_group_requirements)
+
+
+def get_categories() -> tuple[Category, ...]:
+    return _snapshot("categories", lambda: tuple(Category.objects.all().order_by("id")))
+
+
+def get_active_products() -> tuple[Product, ...]:
+    return _snapshot("products", lambda: tuple(Product.objects.filter(is_active=True).order_by("created_at")))
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+IDEMPOTENCY_TTL_SECONDS = 60 * 60 * 24
+IDEMPOTENCY_LOCK_TTL_SECONDS = 60
+IDEMPOTENCY_REDIS_KEY = "idem:{scope}:{user_id}:{key}"
+
+_STATE_PENDING = "pending"
+_STATE_DONE = "done"
+
+
+def _get_redis():
+    try:
+        redis = get_redis_connection("default")
+        redis.ping()
+        return redis
+    except Exception:
+        return None
+
+
+def _hash(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def _request_fingerprint(request: Request) -> str:
+    try:
+        body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    except (TypeError, ValueError):
+        body = ""
+    return _hash(f"{request.method}:{request.get_full_path()}:{body}")
+
+
+def _to_json(data):
+    return json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+
+
+def _replay(status_code: int, data) -> Response:
+    response = Response(data, status=status_code)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _conflict(detail: str, status_code: int = status.HTTP_409_CONFLICT) -> Response:
+    return Response({"detail": detail}, status=status_code)
+
+
+def _is_storable(response) -> bool:
+    return isinstance(response, Response) and response.status_code < 500
+
+
+def _run_with_redis(redis, redis_key: str, fingerprint: str, call):
+    pending = json.dumps({"state": _STATE_PENDING, "fingerprint": fingerprint})
+    try:
+        acquired = redis.set(redis_key, pending, nx=True, ex=IDEMPOTENCY_LOCK_TTL_SECONDS)
+        raw = None if acquired else redis.get(redis_key)
+    except RedisError as exc:
+        logger.warning("Idempotency store unavailable, falling back to DB: %s", exc)
+        return None
+
+    if not acquired:
+        if raw is None:
+            return call()
+        stored = json.loads(raw)
+        if stored.get("fingerprint") != fingerprint:
+            return _conflict("Idempotency-Key was used with a different request", status.HTTP_422_UNPROCESSABLE_ENTITY)
+        if stored.get("state") == _STATE_DONE:
+            return _replay(int(stored["status"]), stored.get("data"))
+        return _conflict("A request with this Idempotency-Key is still in progress")
+
+    try:
+        response = call()
+    except Exception:
+        _redis_delete_safe(redis, redis_key)
+        raise
+    if _is_storable(response):
+        payload = {
+            "state": _STATE_DONE,
+            "fingerprint": fingerprint,
+            "status": response.status_code,
+            "data": _to_json(response.data),
+        }
+        try:
+            redis.set(redis_key, json.dumps(payload), ex=IDEMPOTENCY_TTL_SECONDS)
+        except RedisError as exc:
+            logger.warning("Failed to store idempotent response %s: %s", redis_key, exc)
+    else:
+        _redis_delete_safe(redis, redis_key)
+    return response
+
+
+def _redis_delete_safe(redis, key: str) -> None:
+    try:
+        redis.delete(key)
+    except RedisError:
+        return
+
+
+def _run_with_db(user, scope: str, key: str, fingerprint: str, call):
+    expired_before = timezone.now() - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+    IdempotencyRecord.objects.filter(user=user, created_at__lt=expired_before).delete()
+    try:
+        with transaction.atomic():
+            record = IdempotencyRecord.objects.create(user=user, scope=scope, key=key, fingerprint=fingerprint)
+    except IntegrityError:
+        record = IdempotencyRecord.objects.filter(user=user, scope=scope, key=key).first()
+        if not record:
+            return call()
+        if record.status_code is None and _reclaim_abandoned(record, fingerprint):
+            return _finish_with_db(record, call)
+        if record.fingerprint != fingerprint:
+            return _conflict("Idempotency-Key was used with a different request", status.HTTP_422_UNPROCESSABLE_ENTITY)
+        if record.status_code is not None:
+            return _replay(record.status_code, record.response)
+        return _conflict("A request with this Idempotency-Key is still in progress")
+    return _finish_with_db(record, call)
+
+
+def _reclaim_abandoned(record: IdempotencyRecord, fingerprint: str) -> bool:
+    # A pending record older than the lock TTL was left by a worker that died mid-request.
+    now = timezone.now()
+    claimed = IdempotencyRecord.objects.filter(
+        pk=record.pk,
+        status_code__isnull=True,
+        created_at__lt=now - timedelta(seconds=IDEMPOTENCY_LOCK_TTL_SECONDS),
+    ).update(fingerprint=fingerprint, created_at=now)
+    if claimed:
+        record.fingerprint = fingerprint
+        record.created_at = now
+    return bool(claimed)
+
+
+def _finish_with_db(record: IdempotencyRecord, call):
+    try:
+        response = call()
+    except Exception:
+        record.delete()
+        raise
+    if _is_storable(response):
+        record.status_code = response.status_code
+        record.response = _to_json(response.data)
+        record.save(update_fields=["status_code", "response"])
+    else:
+        record.delete()
+    return response
+
+
+def idempotent(scope: str):
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(*args, **kwargs):
+            request = next((arg for arg in args if isinstance(arg, Request)), None)
+            if request is None:
+                return view_func(*args, **kwargs)
+            key = (request.headers.get(IDEMPOTENCY_HEADER) or "").strip()
+            if not key or not request.user or not request.user.is_authenticated:
+                return view_func(*args, **kwargs)
+            if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+                return _conflict("Idempotency-Key is too long", status.HTTP_400_BAD_REQUEST)
+
+            hashed_key = _hash(key)
+            fingerprint = _request_fingerprint(request)
+
+            def call():
+                return view_func(*args, **kwargs)
+
+            redis = _get_redis()
+            if redis:
+                redis_key = IDEMPOTENCY_REDIS_KEY.format(scope=scope, user_id=request.user.id, key=hashed_key)
+                response = _run_with_redis(redis, redis_key, fingerprint, call)
+                if response is not None:
+                    return response
+            return _run_with_db(request.user, scope, hashed_key, fingerprint, call)
+
+        return wrapper
+
+    return decorator
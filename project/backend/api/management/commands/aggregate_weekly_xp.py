@@ -1,53 +1,89 @@
 from datetime import date, timedelta
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from django_redis import get_redis_connection
 
-from api.models import User, XpTransaction
+from api.models import LeaderboardSnapshot
+from api.views import (
+    _aggregate_monthly_snapshot,
+    _aggregate_weekly_xp,
+    _flush_pending_xp_to_db,
+    _get_redis,
+    _has_pending_xp_between,
+    _history_period_bounds,
+    _last_completed_period_start,
+)
 
 
 class Command(BaseCommand):
-    help = "Aggregate weekly XP from Redis into XpTransaction records."
+    help = "Aggregate weekly XP from interval transactions and snapshot finished week/month leaderboards."
 
     def add_arguments(self, parser):
         parser.add_argument("--week-start", type=str)
-        parser.add_argument("--keep", action="store_true")
+        parser.add_argument("--month-start", type=str)
+        parser.add_argument("--from", dest="date_from", type=str, help="Backfill every finished week and month from this date.")
+        parser.add_argument("--to", dest="date_to", type=str, help="Backfill end date (defaults to the last finished week).")
+        parser.add_argument("--force", action="store_true", help="Rebuild even if the period is already archived.")
 
     def handle(self, *args, **options):
-        if options.get("week_start"):
-            week_start = date.fromisoformat(options["week_start"])
-        else:
-            today = timezone.localdate()
-            week_start = today - timedelta(days=today.weekday()) - timedelta(days=7)
-
-        week_end = week_start + timedelta(days=6)
-        redis = get_redis_connection("default")
-        key = f"xp:week:{week_start.isoformat()}"
-
-        raw = redis.zrange(key, 0, -1, withscores=True)
-        if not raw:
-            self.stdout.write("No weekly XP data found.")
-            return
+        redis = _get_redis()
+        if redis:
+            try:
+                _flush_pending_xp_to_db(redis)
+            except Exception as exc:
+                self.stderr.write(f"Flush failed: {exc}")
 
-        user_ids = [int(item[0]) for item in raw]
-        users = User.objects.filter(id__in=user_ids)
-        user_map = {u.id: u for u in users}
+        force = bool(options.get("force"))
+        if options.get("date_from"):
+            try:
+                date_from = date.fromisoformat(options["date_from"])
+                date_to = (
+                    date.fromisoformat(options["date_to"])
+                    if options.get("date_to")
+                    else _last_completed_period_start("week") + timedelta(days=6)
+                )
+            except ValueError as exc:
+                raise CommandError(f"Invalid date: {exc}")
+            date_to = min(date_to, timezone.localdate() - timedelta(days=1))
+            if date_to < date_from:
+                raise CommandError("--to must not be earlier than --from")
+            weeks = []
+            cursor = date_from - timedelta(days=date_from.weekday())
+            while cursor + timedelta(days=6) <= date_to:
+                weeks.append(cursor)
+                cursor += timedelta(days=7)
+            months = []
+            cursor = date_from.replace(day=1)
+            while (cursor + timedelta(days=32)).replace(day=1) - timedelta(days=1) <= date_to:
+                months.append(cursor)
+                cursor = (cursor + timedelta(days=32)).replace(day=1)
+            force = True
+        else:
+            weeks = [
+                date.fromisoformat(options["week_start"])
+                if options.get("week_start")
+                else _last_completed_period_start("week")
+            ]
+            months = [
+                date.fromisoformat(options["month_start"])
+                if options.get("month_start")
+                else _last_completed_period_start("month")
+            ]
 
-        for member, score in raw:
-            user_id = int(member)
-            if user_id not in user_map:
+        periods = [("week", item, _aggregate_weekly_xp) for item in weeks]
+        periods.extend(("month", item, _aggregate_monthly_snapshot) for item in months)
+        for range_key, period_start, aggregate in periods:
+            if not force and LeaderboardSnapshot.objects.filter(range_key=range_key, period_start=period_start).exists():
                 continue
-            XpTransaction.objects.update_or_create(
-                user_id=user_id,
-                week_start=week_start,
-                defaults={
-                    "week_end": week_end,
-                    "xp": int(score),
-                },
+            if redis:
+                _, _, start_dt, end_dt = _history_period_bounds(range_key, period_start)
+                if _has_pending_xp_between(redis, start_dt, end_dt):
+                    self.stdout.write(
+                        f"Skipped {range_key} {period_start.isoformat()}: XP for the period is still pending in Redis."
+                    )
+                    continue
+            snapshot = aggregate(period_start)
+            self.stdout.write(
+                f"Archived {range_key} {snapshot.period_start.isoformat()} to {snapshot.period_end.isoformat()}: "
+                f"{snapshot.participants} participants."
             )
-
-        if not options.get("keep"):
-            redis.delete(key)
-
-        self.stdout.write(f"Aggregated weekly XP for {week_start.isoformat()} to {week_end.isoformat()}.")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from api.views import (
+    XP_INTERVAL_COMPACT_MAX_DAYS,
+    XP_INTERVAL_RETENTION_DAYS,
+    _compact_xp_intervals,
+)
+
+
+class Command(BaseCommand):
+    help = "Roll 3-hour XP intervals older than the longest leaderboard window into daily rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retention-days", type=int, default=XP_INTERVAL_RETENTION_DAYS)
+        parser.add_argument("--max-days", type=int, default=XP_INTERVAL_COMPACT_MAX_DAYS)
+
+    def handle(self, *args, **options):
+        days, removed = _compact_xp_intervals(
+            retention_days=options["retention_days"],
+            max_days=options["max_days"],
+        )
+        if days:
+            self.stdout.write(f"Compacted {days} day(s), removed {removed} interval row(s).")
+        else:
+            self.stdout.write("Nothing to compact.")
@@ -1,6 +1,12 @@
 from django.core.management.base import BaseCommand
 
-from api.views import _flush_pending_xp_to_db, _get_redis
+from api.views import (
+    _flush_pending_xp_to_db,
+    _get_redis,
+    _maybe_refresh_leaderboard_ranks,
+    _process_deferred_title_syncs,
+    _refresh_leaderboard_caches,
+)
 
 
 class Command(BaseCommand):
@@ -25,3 +31,17 @@ class Command(BaseCommand):
             self.stdout.write("XP intervals flushed successfully.")
         else:
             self.stdout.write("No flush required (interval not reached or no pending XP).")
+
+        try:
+            synced = _process_deferred_title_syncs(redis)
+        except Exception as exc:
+            self.stderr.write(f"Title sync failed: {exc}")
+            return
+        if synced:
+            self.stdout.write(f"Deferred titles synced: {synced}")
+
+        try:
+            refreshed = _maybe_refresh_leaderboard_ranks(("week", "month", "all"), force=bool(created), redis=redis)
+            _refresh_leaderboard_caches(force_ranges=refreshed)
+        except Exception as exc:
+            self.stderr.write(f"Leaderboard refresh failed: {exc}")
@@ -0,0 +1,46 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_habit_end_date_archive'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardRank',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('range_key', models.CharField(choices=[('week', 'Неделя'), ('month', 'Месяц'), ('all', 'Всё время')], max_length=8, verbose_name='Период')),
+                ('rank', models.PositiveIntegerField(verbose_name='Место')),
+                ('score', models.BigIntegerField(default=0, verbose_name='Очки')),
+                ('refreshed_at', models.DateTimeField(verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Место в рейтинге',
+                'verbose_name_plural': 'Места в рейтинге',
+                'ordering': ('range_key', 'rank'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['participation_in_ratings', '-xp', 'id'], name='api_user_rating_idx'),
+        ),
+        migrations.AddField(
+            model_name='leaderboardrank',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_ranks', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardrank',
+            index=models.Index(fields=['range_key', 'rank'], name='api_leaderb_range_k_bc722b_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardrank',
+            constraint=models.UniqueConstraint(fields=('range_key', 'user'), name='unique_leaderboard_rank_user'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_user_rating_index_leaderboard_rank'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('range_key', models.CharField(choices=[('week', 'Неделя'), ('month', 'Месяц')], max_length=8, verbose_name='Период')),
+                ('period_start', models.DateField(verbose_name='Начало периода')),
+                ('period_end', models.DateField(verbose_name='Конец периода')),
+                ('participants', models.PositiveIntegerField(default=0, verbose_name='Участников')),
+                ('top', models.JSONField(blank=True, default=list, verbose_name='Топ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создан')),
+            ],
+            options={
+                'verbose_name': 'Итоги рейтинга',
+                'verbose_name_plural': 'Итоги рейтинга',
+                'ordering': ('range_key', '-period_start'),
+            },
+        ),
+        migrations.AddField(
+            model_name='xptransaction',
+            name='rank',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Место'),
+        ),
+        migrations.AddIndex(
+            model_name='xptransaction',
+            index=models.Index(fields=['week_start', 'rank'], name='api_xptrans_week_st_7f4a91_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardsnapshot',
+            constraint=models.UniqueConstraint(fields=('range_key', 'period_start'), name='unique_leaderboard_snapshot_period'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_idempotency_record'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitCompletionEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=64, verbose_name='ID события')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('delta', models.IntegerField(verbose_name='Изменение')),
+                ('client_ts', models.DateTimeField(verbose_name='Время на клиенте')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Получено')),
+                ('habit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='completion_events', to='api.habit')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='habit_completion_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Событие выполнения привычки',
+                'verbose_name_plural': 'События выполнения привычек',
+                'ordering': ('-created_at',),
+                'constraints': [models.UniqueConstraint(fields=('user', 'event_id'), name='unique_habit_completion_event')],
+            },
+        ),
+    ]
@@ -0,0 +1,85 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+WEEKDAY_NAMES = (
+    "Понедельник",
+    "Вторник",
+    "Среда",
+    "Четверг",
+    "Пятница",
+    "Суббота",
+    "Воскресенье",
+)
+
+
+def weekday_mask(repeat_days):
+    if not isinstance(repeat_days, list) or not repeat_days:
+        return (1 << len(WEEKDAY_NAMES)) - 1
+    mask = 0
+    for index, name in enumerate(WEEKDAY_NAMES):
+        if name in repeat_days:
+            mask |= 1 << index
+    return mask
+
+
+def reminder_minutes(reminder_times):
+    if not isinstance(reminder_times, list):
+        return set()
+    minutes = set()
+    for value in reminder_times:
+        if not isinstance(value, str):
+            continue
+        candidate = value.strip()[:5]
+        if len(candidate) != 5 or candidate[2] != ":":
+            continue
+        hh, mm = candidate[:2], candidate[3:]
+        if not (hh.isdigit() and mm.isdigit()):
+            continue
+        if int(hh) > 23 or int(mm) > 59:
+            continue
+        minutes.add(int(hh) * 60 + int(mm))
+    return minutes
+
+
+def populate_habit_reminders(apps, schema_editor):
+    Habit = apps.get_model("api", "Habit")
+    HabitReminder = apps.get_model("api", "HabitReminder")
+
+    rows = []
+    habits = Habit.objects.filter(reminder=True).only("id", "repeat_days", "reminder_times")
+    for habit in habits.iterator(chunk_size=2000):
+        mask = weekday_mask(habit.repeat_days)
+        for minute in reminder_minutes(habit.reminder_times):
+            rows.append(HabitReminder(habit_id=habit.id, minute_of_day=minute, weekday_mask=mask))
+        if len(rows) >= 2000:
+            HabitReminder.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    if rows:
+        HabitReminder.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_habit_completion_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HabitReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minute_of_day', models.PositiveSmallIntegerField(verbose_name='Минута дня')),
+                ('weekday_mask', models.PositiveSmallIntegerField(default=127, verbose_name='Дни недели (битовая маска)')),
+                ('habit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminder_slots', to='api.habit')),
+            ],
+            options={
+                'verbose_name': 'Напоминание привычки',
+                'verbose_name_plural': 'Напоминания привычек',
+                'ordering': ('minute_of_day', 'habit_id'),
+                'indexes': [models.Index(fields=['minute_of_day'], name='api_habit_reminder_minute_idx')],
+                'constraints': [models.UniqueConstraint(fields=('habit', 'minute_of_day'), name='unique_habit_reminder_minute')],
+            },
+        ),
+        migrations.RunPython(populate_habit_reminders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations, models
+
+WEEKDAY_NAMES = (
+    "Понедельник",
+    "Вторник",
+    "Среда",
+    "Четверг",
+    "Пятница",
+    "Суббота",
+    "Воскресенье",
+)
+ALL_WEEKDAYS_MASK = (1 << len(WEEKDAY_NAMES)) - 1
+
+
+def weekday_mask(repeat_days):
+    if not isinstance(repeat_days, list) or not repeat_days:
+        return ALL_WEEKDAYS_MASK
+    mask = 0
+    for index, name in enumerate(WEEKDAY_NAMES):
+        if name in repeat_days:
+            mask |= 1 << index
+    return mask
+
+
+def populate_repeat_mask(apps, schema_editor):
+    Habit = apps.get_model("api", "Habit")
+
+    ids_by_mask = {}
+    for habit_id, repeat_days in Habit.objects.values_list("id", "repeat_days").iterator(chunk_size=2000):
+        mask = weekday_mask(repeat_days)
+        if mask != ALL_WEEKDAYS_MASK:
+            ids_by_mask.setdefault(mask, []).append(habit_id)
+    for mask, ids in ids_by_mask.items():
+        for i in range(0, len(ids), 500):
+            Habit.objects.filter(id__in=ids[i : i + 500]).update(repeat_mask=mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_habit_reminder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habit',
+            name='repeat_mask',
+            field=models.PositiveSmallIntegerField(default=127, verbose_name='Дни повтора (битовая маска)'),
+        ),
+        migrations.RunPython(populate_repeat_mask, migrations.RunPython.noop),
+    ]
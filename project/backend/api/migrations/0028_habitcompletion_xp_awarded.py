@@ -0,0 +1,23 @@
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_rewarded_completions(apps, schema_editor):
+    HabitCompletion = apps.get_model("api", "HabitCompletion")
+    HabitCompletion.objects.filter(count__gte=1).filter(count__gte=F("habit__goal")).update(xp_awarded=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_habit_repeat_mask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='habitcompletion',
+            name='xp_awarded',
+            field=models.BooleanField(default=False, verbose_name='Опыт начислен'),
+        ),
+        migrations.RunPython(mark_rewarded_completions, migrations.RunPython.noop),
+    ]
@@ -4,7 +4,7 @@ from django.utils import timezone
 import uuid
 import os
 import requests
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
 from django.dispatch import receiver
 from django.conf import settings
 import urllib.parse
@@ -90,6 +90,9 @@ class User(AbstractBaseUser, PermissionsMixin):
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
         ordering = ("-date_joined",)
+        indexes = [
+            models.Index(fields=["participation_in_ratings", "-xp", "id"], name="api_user_rating_idx"),
+        ]
 
     @property
     def is_anonymous(self):
@@ -173,6 +176,32 @@ class Category(models.Model):
         return self.name
 
 
+HABIT_WEEKDAY_NAMES = (
+    "Понедельник",
+    "Вторник",
+    "Среда",
+    "Четверг",
+    "Пятница",
+    "Суббота",
+    "Воскресенье",
+)
+ALL_WEEKDAYS_MASK = (1 << len(HABIT_WEEKDAY_NAMES)) - 1
+
+
+def weekday_mask(repeat_days) -> int:
+    if not isinstance(repeat_days, list) or not repeat_days:
+        return ALL_WEEKDAYS_MASK
+    mask = 0
+    for index, name in enumerate(HABIT_WEEKDAY_NAMES):
+        if name in repeat_days:
+            mask |= 1 << index
+    return mask
+
+
+def weekday_bit(day) -> int:
+    return 1 << day.weekday()
+
+
 def get_default_category_id():
     default_name = "Личное"
     category = Category.objects.filter(name=default_name).first()
@@ -208,6 +237,7 @@ class Habit(models.Model):
     icon = models.CharField("Иконка", max_length=32, default="✅")
     goal = models.PositiveIntegerField("Цель в день", default=1)
     repeat_days = models.JSONField("Дни повтора", default=list, blank=True)
+    repeat_mask = models.PositiveSmallIntegerField("Дни повтора (битовая маска)", default=ALL_WEEKDAYS_MASK)
     reminder = models.BooleanField("Напоминания включены", default=False)
     reminder_times = models.JSONField("Время напоминаний", default=list, blank=True)
     visibility = models.CharField("Видимость", max_length=20, choices=VISIBILITY_CHOICES, default="Приватный")
@@ -232,11 +262,20 @@ class Habit(models.Model):
     def __str__(self):
         return f"{self.title} ({self.owner_id})"
 
+    def save(self, *args, **kwargs):
+        if "repeat_days" in self.__dict__:
+            self.repeat_mask = weekday_mask(self.repeat_days)
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and "repeat_days" in update_fields:
+                kwargs["update_fields"] = {*update_fields, "repeat_mask"}
+        super().save(*args, **kwargs)
+
 
 class HabitCompletion(models.Model):
     habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name="completions")
     date = models.DateField("Дата")
     count = models.PositiveIntegerField("Количество", default=0)
+    xp_awarded = models.BooleanField("Опыт начислен", default=False)
 
     class Meta:
         verbose_name = "Выполнение привычки"
@@ -250,6 +289,47 @@ class HabitCompletion(models.Model):
         return f"{self.habit_id} {self.date} ({self.count})"
 
 
+class HabitReminder(models.Model):
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name="reminder_slots")
+    minute_of_day = models.PositiveSmallIntegerField("Минута дня")
+    weekday_mask = models.PositiveSmallIntegerField("Дни недели (битовая маска)", default=ALL_WEEKDAYS_MASK)
+
+    class Meta:
+        verbose_name = "Напоминание привычки"
+        verbose_name_plural = "Напоминания привычек"
+        ordering = ("minute_of_day", "habit_id")
+        constraints = [
+            models.UniqueConstraint(fields=["habit", "minute_of_day"], name="unique_habit_reminder_minute"),
+        ]
+        indexes = [
+            models.Index(fields=["minute_of_day"], name="api_habit_reminder_minute_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.habit_id} {self.minute_of_day // 60:02d}:{self.minute_of_day % 60:02d}"
+
+
+class HabitCompletionEvent(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="habit_completion_events")
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name="completion_events")
+    event_id = models.CharField("ID события", max_length=64)
+    date = models.DateField("Дата")
+    delta = models.IntegerField("Изменение")
+    client_ts = models.DateTimeField("Время на клиенте")
+    created_at = models.DateTimeField("Получено", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Событие выполнения привычки"
+        verbose_name_plural = "События выполнения привычек"
+        ordering = ("-created_at",)
+        constraints = [
+            models.UniqueConstraint(fields=["user", "event_id"], name="unique_habit_completion_event"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.event_id}"
+
+
 class HabitCopy(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="habit_copies")
     source_habit = models.ForeignKey(Habit, on_delete=models.CASCADE, related_name="habit_copies")
@@ -293,6 +373,7 @@ class XpTransaction(models.Model):
     week_start = models.DateField("Начало недели")
     week_end = models.DateField("Конец недели")
     xp = models.BigIntegerField("Опыт", default=0)
+    rank = models.PositiveIntegerField("Место", null=True, blank=True)
     created_at = models.DateTimeField("Создан", auto_now_add=True)
 
     class Meta:
@@ -302,6 +383,9 @@ class XpTransaction(models.Model):
         constraints = [
             models.UniqueConstraint(fields=["user", "week_start"], name="unique_user_week_xp"),
         ]
+        indexes = [
+            models.Index(fields=["week_start", "rank"]),
+        ]
 
     def __str__(self):
         return f"{self.user_id} {self.week_start} {self.xp}"
@@ -331,6 +415,59 @@ class XpIntervalTransaction(models.Model):
         return f"{self.user_id} {self.period_start.isoformat()} {self.xp}"
 
 
+class LeaderboardRank(models.Model):
+    RANGE_CHOICES = (
+        ("week", "Неделя"),
+        ("month", "Месяц"),
+        ("all", "Всё время"),
+    )
+
+    range_key = models.CharField("Период", max_length=8, choices=RANGE_CHOICES)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="leaderboard_ranks")
+    rank = models.PositiveIntegerField("Место")
+    score = models.BigIntegerField("Очки", default=0)
+    refreshed_at = models.DateTimeField("Обновлено")
+
+    class Meta:
+        verbose_name = "Место в рейтинге"
+        verbose_name_plural = "Места в рейтинге"
+        ordering = ("range_key", "rank")
+        constraints = [
+            models.UniqueConstraint(fields=["range_key", "user"], name="unique_leaderboard_rank_user"),
+        ]
+        indexes = [
+            models.Index(fields=["range_key", "rank"]),
+        ]
+
+    def __str__(self):
+        return f"{self.range_key} #{self.rank} {self.user_id}"
+
+
+class LeaderboardSnapshot(models.Model):
+    RANGE_CHOICES = (
+        ("week", "Неделя"),
+        ("month", "Месяц"),
+    )
+
+    range_key = models.CharField("Период", max_length=8, choices=RANGE_CHOICES)
+    period_start = models.DateField("Начало периода")
+    period_end = models.DateField("Конец периода")
+    participants = models.PositiveIntegerField("Участников", default=0)
+    top = models.JSONField("Топ", default=list, blank=True)
+    created_at = models.DateTimeField("Создан", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Итоги рейтинга"
+        verbose_name_plural = "Итоги рейтинга"
+        ordering = ("range_key", "-period_start")
+        constraints = [
+            models.UniqueConstraint(fields=["range_key", "period_start"], name="unique_leaderboard_snapshot_period"),
+        ]
+
+    def __str__(self):
+        return f"{self.range_key} {self.period_start}"
+
+
 class Title(models.Model):
     code = models.CharField("Код", max_length=32, unique=True)
     name = models.CharField("Название", max_length=80)
@@ -410,6 +547,30 @@ class UserQuest(models.Model):
         return f"{self.user_id} {self.quest_id}"
 
 
+class IdempotencyRecord(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="idempotency_records")
+    scope = models.CharField("Операция", max_length=64)
+    key = models.CharField("Ключ", max_length=64)
+    fingerprint = models.CharField("Отпечаток запроса", max_length=64)
+    status_code = models.PositiveSmallIntegerField("HTTP-статус", null=True, blank=True)
+    response = models.JSONField("Ответ", null=True, blank=True)
+    created_at = models.DateTimeField("Создан", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Ключ идемпотентности"
+        verbose_name_plural = "Ключи идемпотентности"
+        ordering = ("-created_at",)
+        constraints = [
+            models.UniqueConstraint(fields=["user", "scope", "key"], name="unique_idempotency_key"),
+        ]
+        indexes = [
+            models.Index(fields=["created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.scope} {self.key}"
+
+
 @receiver(pre_delete, sender=Category)
 def reassign_habits_on_category_delete(sender, instance, **kwargs):
     fallback = Category.objects.exclude(id=instance.id).filter(name="Личное").first()
@@ -418,3 +579,86 @@ def reassign_habits_on_category_delete(sender, instance, **kwargs):
     if not fallback:
         fallback = Category.objects.create(name="Личное")
     Habit.objects.filter(category=instance).update(category=fallback)
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_delete, sender=Title)
+@receiver(post_save, sender=Quest)
+@receiver(post_delete, sender=Quest)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    from .catalog import bump_catalog_version
+
+    bump_catalog_version()
+
+
+REMINDER_HABIT_FIELDS = {"reminder", "reminder_times", "owner", "owner_id"}
+REMINDER_USER_FIELDS = {"is_active", "notification_habit", "telegram_id"}
+
+
+def _loaded(instance, names) -> bool:
+    return all(name in instance.__dict__ for name in names)
+
+
+@receiver(post_init, sender=Habit)
+def snapshot_habit_reminders(sender, instance, **kwargs):
+    if _loaded(instance, ("reminder", "reminder_times")):
+        instance._reminder_snapshot = (instance.reminder, list(instance.reminder_times or []))
+
+
+@receiver(post_init, sender=User)
+def snapshot_user_reminders(sender, instance, **kwargs):
+    if _loaded(instance, ("is_active", "notification_habit", "telegram_id")):
+        instance._reminder_snapshot = (instance.is_active, instance.notification_habit, instance.telegram_id)
+
+
+@receiver(post_save, sender=Habit)
+def update_reminder_index_on_habit_save(sender, instance, created, update_fields=None, **kwargs):
+    from .reminder_index import habit_slots, owner_receives_reminders, schedule_slot_changes
+
+    if update_fields is not None and not REMINDER_HABIT_FIELDS.intersection(update_fields):
+        return
+    owner = instance._state.fields_cache.get("owner")
+    if owner is not None and _loaded(owner, ("is_active", "notification_habit", "telegram_id")):
+        eligible = owner_receives_reminders(owner.is_active, owner.notification_habit, owner.telegram_id)
+    else:
+        row = User.objects.filter(id=instance.owner_id).values_list(
+            "is_active", "notification_habit", "telegram_id"
+        ).first()
+        eligible = bool(row and owner_receives_reminders(*row))
+    snapshot = None if created else getattr(instance, "_reminder_snapshot", None)
+    old_slots = habit_slots(snapshot[0], snapshot[1], eligible) if snapshot else set()
+    new_slots = habit_slots(instance.reminder, instance.reminder_times, eligible)
+    schedule_slot_changes([(instance.id, old_slots, new_slots)])
+    instance._reminder_snapshot = (instance.reminder, list(instance.reminder_times or []))
+
+
+@receiver(post_delete, sender=Habit)
+def update_reminder_index_on_habit_delete(sender, instance, **kwargs):
+    from .reminder_index import habit_slots, schedule_slot_changes
+
+    snapshot = getattr(instance, "_reminder_snapshot", None)
+    if snapshot:
+        schedule_slot_changes([(instance.id, habit_slots(snapshot[0], snapshot[1], True), set())])
+
+
+@receiver(post_save, sender=User)
+def update_reminder_index_on_user_save(sender, instance, created, update_fields=None, **kwargs):
+    from .reminder_index import owner_receives_reminders, reindex_user_habits
+
+    snapshot = getattr(instance, "_reminder_snapshot", None)
+    if created or snapshot is None:
+        return
+    if update_fields is not None and not REMINDER_USER_FIELDS.intersection(update_fields):
+        return
+    current = (instance.is_active, instance.notification_habit, instance.telegram_id)
+    if current != snapshot:
+        reindex_user_habits(
+            instance.id,
+            owner_receives_reminders(*snapshot),
+            owner_receives_reminders(*current),
+        )
+    instance._reminder_snapshot = current
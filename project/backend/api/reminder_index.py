@@ -0,0 +1,293 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django_redis import get_redis_connection
+
+from .models import Habit, HabitCompletion, HabitReminder, weekday_bit
+
+logger = logging.getLogger(__name__)
+
+INDEX_KEY = "tg:reminder:index:slots"
+INDEX_BUILD_KEY = "tg:reminder:index:slots:building"
+INDEX_BUILDING_KEY = "tg:reminder:index:building"
+INDEX_READY_KEY = "tg:reminder:index:ready"
+INDEX_REBUILD_TS_KEY = "tg:reminder:index:rebuilt_at"
+INDEX_LOCK_KEY = "tg:reminder:index:rebuild_lock"
+INDEX_REBUILD_INTERVAL_SECONDS = 60 * 60 * 6
+INDEX_TTL_SECONDS = INDEX_REBUILD_INTERVAL_SECONDS * 2
+INDEX_LOCK_TTL_SECONDS = 180
+
+
+def normalize_hhmm(value) -> str | None:
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    if len(value) < 5:
+        return None
+    candidate = value[:5]
+    if len(candidate) != 5 or candidate[2] != ":":
+        return None
+    hh = candidate[:2]
+    mm = candidate[3:5]
+    if not (hh.isdigit() and mm.isdigit()):
+        return None
+    hhi = int(hh)
+    mmi = int(mm)
+    if hhi < 0 or hhi > 23 or mmi < 0 or mmi > 59:
+        return None
+    return f"{hhi:02d}:{mmi:02d}"
+
+
+def collect_unique_hhmm(reminder_times) -> set[str]:
+    if not isinstance(reminder_times, list):
+        return set()
+    result: set[str] = set()
+    for value in reminder_times:
+        parsed = normalize_hhmm(value)
+        if parsed:
+            result.add(parsed)
+    return result
+
+
+def reminder_slots_queryset():
+    return HabitReminder.objects.filter(
+        habit__reminder=True,
+        habit__owner__is_active=True,
+        habit__owner__notification_habit=True,
+        habit__owner__telegram_id__isnull=False,
+    )
+
+
+def due_reminders_queryset(minute: int, day):
+    completed = HabitCompletion.objects.filter(
+        habit_id=OuterRef("habit_id"),
+        date=day,
+        count__gte=OuterRef("habit__goal"),
+    )
+    return (
+        reminder_slots_queryset()
+        .annotate(day_bit=F("weekday_mask").bitand(weekday_bit(day)))
+        .filter(minute_of_day=minute, day_bit__gt=0)
+        .exclude(Exists(completed))
+    )
+
+
+def streak_risk_habits_queryset(day):
+    yesterday = day - timedelta(days=1)
+    completed_yesterday = HabitCompletion.objects.filter(
+        habit_id=OuterRef("pk"),
+        date=yesterday,
+        count__gte=OuterRef("goal"),
+    )
+    completed_today = HabitCompletion.objects.filter(
+        habit_id=OuterRef("pk"),
+        date=day,
+        count__gte=OuterRef("goal"),
+    )
+    # Cached streak fields lag until the owner's next rollup, so yesterday's completion is checked directly too.
+    return (
+        Habit.objects.filter(
+            is_archived=False,
+            owner__is_active=True,
+            owner__notification_streak=True,
+            owner__telegram_id__isnull=False,
+        )
+        .filter(Q(end_date__isnull=True) | Q(end_date__gte=day))
+        .annotate(day_bit=F("repeat_mask").bitand(weekday_bit(day)))
+        .filter(day_bit__gt=0)
+        .filter(Exists(completed_yesterday) | Q(streak_last_date=yesterday, streak_current__gt=0))
+        .exclude(Exists(completed_today))
+    )
+
+
+def sync_habit_reminders(habit: Habit) -> None:
+    minutes = set()
+    if habit.reminder:
+        minutes = {minute_of_day(hhmm) for hhmm in collect_unique_hhmm(habit.reminder_times)}
+    slots = HabitReminder.objects.filter(habit=habit)
+    slots.exclude(minute_of_day__in=minutes).delete()
+    if not minutes:
+        return
+    mask = habit.repeat_mask
+    slots.exclude(weekday_mask=mask).update(weekday_mask=mask)
+    HabitReminder.objects.bulk_create(
+        [HabitReminder(habit=habit, minute_of_day=minute, weekday_mask=mask) for minute in sorted(minutes)],
+        ignore_conflicts=True,
+    )
+
+
+def _get_redis():
+    try:
+        return get_redis_connection("default")
+    except Exception:
+        return None
+
+
+def _decode(value) -> str | None:
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    return str(value)
+
+
+def minute_of_day(hhmm: str) -> int:
+    return int(hhmm[:2]) * 60 + int(hhmm[3:5])
+
+
+def _slot_member(habit_id: int, minute: int) -> str:
+    return f"{int(habit_id)}:{minute}"
+
+
+def rebuild_index() -> bool:
+    redis = _get_redis()
+    if redis is None:
+        return False
+    if not redis.set(INDEX_LOCK_KEY, "1", nx=True, ex=INDEX_LOCK_TTL_SECONDS):
+        return False
+
+    redis.delete(INDEX_BUILD_KEY)
+    # Incremental updates also go to the key being built, so edits made during the scan survive the swap.
+    redis.set(INDEX_BUILDING_KEY, "1", ex=INDEX_LOCK_TTL_SECONDS)
+    pipe = redis.pipeline(transaction=False)
+    batch: dict[str, int] = {}
+
+    slots = reminder_slots_queryset().values_list("habit_id", "minute_of_day")
+    for habit_id, minute in slots.iterator(chunk_size=5000):
+        batch[_slot_member(habit_id, minute)] = minute
+        if len(batch) >= 10000:
+            pipe.zadd(INDEX_BUILD_KEY, batch)
+            pipe.execute()
+            batch = {}
+    if batch:
+        pipe.zadd(INDEX_BUILD_KEY, batch)
+        pipe.execute()
+
+    pipe = redis.pipeline(transaction=True)
+    if redis.exists(INDEX_BUILD_KEY):
+        pipe.expire(INDEX_BUILD_KEY, INDEX_TTL_SECONDS)
+        pipe.rename(INDEX_BUILD_KEY, INDEX_KEY)
+    else:
+        pipe.delete(INDEX_BUILD_KEY, INDEX_KEY)
+    pipe.set(INDEX_READY_KEY, "1", ex=INDEX_TTL_SECONDS)
+    pipe.set(INDEX_REBUILD_TS_KEY, str(int(time.time())), ex=INDEX_TTL_SECONDS)
+    pipe.delete(INDEX_BUILDING_KEY)
+    pipe.delete(INDEX_LOCK_KEY)
+    pipe.execute()
+    return True
+
+
+def ensure_index(force: bool = False) -> None:
+    redis = _get_redis()
+    if redis is None:
+        return
+    if force:
+        rebuild_index()
+        return
+
+    ready, last = redis.mget(INDEX_READY_KEY, INDEX_REBUILD_TS_KEY)
+    now_ts = int(time.time())
+    if not ready or not last:
+        rebuild_index()
+        return
+
+    try:
+        last_ts = int(last)
+    except Exception:
+        rebuild_index()
+        return
+
+    if now_ts - last_ts >= INDEX_REBUILD_INTERVAL_SECONDS:
+        rebuild_index()
+
+
+def get_due_habit_ids(now_hhmm: str) -> list[int] | None:
+    redis = _get_redis()
+    if redis is None:
+        return None
+
+    minute = minute_of_day(now_hhmm)
+    try:
+        pipe = redis.pipeline(transaction=True)
+        pipe.exists(INDEX_READY_KEY)
+        pipe.zrangebyscore(INDEX_KEY, minute, minute)
+        ready, members = pipe.execute()
+    except Exception as exc:
+        logger.warning("Failed to read reminder index: %s", exc)
+        return None
+    # An empty slot is only meaningful once a full build has completed.
+    if not ready:
+        return None
+    result: list[int] = []
+    for raw in members:
+        try:
+            result.append(int(_decode(raw).split(":", 1)[0]))
+        except Exception:
+            continue
+    return result
+
+
+def _apply_slot_changes(changes: list[tuple[int, set[str], set[str]]]) -> None:
+    redis = _get_redis()
+    if redis is None:
+        return
+    try:
+        building, ready = redis.mget(INDEX_BUILDING_KEY, INDEX_READY_KEY)
+        keys = []
+        if ready:
+            keys.append(INDEX_KEY)
+        if building:
+            keys.append(INDEX_BUILD_KEY)
+        if not keys:
+            return
+        removed: list[str] = []
+        added: dict[str, int] = {}
+        for habit_id, old_slots, new_slots in changes:
+            for hhmm in old_slots - new_slots:
+                removed.append(_slot_member(habit_id, minute_of_day(hhmm)))
+            for hhmm in new_slots - old_slots:
+                minute = minute_of_day(hhmm)
+                added[_slot_member(habit_id, minute)] = minute
+        pipe = redis.pipeline(transaction=False)
+        for key in keys:
+            if removed:
+                pipe.zrem(key, *removed)
+            if added:
+                pipe.zadd(key, added)
+        pipe.execute()
+    except Exception as exc:
+        logger.warning("Failed to update reminder index incrementally: %s", exc)
+
+
+def schedule_slot_changes(changes: list[tuple[int, set[str], set[str]]]) -> None:
+    changes = [(habit_id, old, new) for habit_id, old, new in changes if old != new]
+    if changes:
+        transaction.on_commit(lambda: _apply_slot_changes(changes))
+
+
+def owner_receives_reminders(is_active, notification_habit, telegram_id) -> bool:
+    return bool(is_active and notification_habit and telegram_id)
+
+
+def habit_slots(reminder, reminder_times, owner_eligible: bool) -> set[str]:
+    if not reminder or not owner_eligible:
+        return set()
+    return collect_unique_hhmm(reminder_times)
+
+
+def reindex_user_habits(user_id: int, was_eligible: bool, is_eligible: bool) -> None:
+    if was_eligible == is_eligible:
+        return
+    changes = []
+    for habit_id, reminder_times in Habit.objects.filter(owner_id=user_id, reminder=True).values_list(
+        "id",
+        "reminder_times",
+    ):
+        slots = collect_unique_hhmm(reminder_times)
+        old_slots = slots if was_eligible else set()
+        new_slots = slots if is_eligible else set()
+        changes.append((habit_id, old_slots, new_slots))
+    schedule_slot_changes(changes)
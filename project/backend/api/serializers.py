@@ -2,6 +2,8 @@ from rest_framework import serializers
 
 from django.utils import timezone
 from datetime import date
+from .catalog import get_title
+from .reminder_index import sync_habit_reminders
 from .models import Product, User, Habit, HabitCompletion, Category, Title, Quest, Payment
 
 
@@ -54,7 +56,7 @@ class UserSerializer(serializers.ModelSerializer):
         return bool(obj.premium_expiration and obj.premium_expiration > timezone.now())
 
     def get_title(self, obj):
-        title = obj.current_title
+        title = get_title(obj.current_title_id)
         return title.name if title else ""
 
 
@@ -203,6 +205,17 @@ class HabitSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Дата окончания не может быть в прошлом.")
         return value
 
+    def create(self, validated_data):
+        habit = super().create(validated_data)
+        sync_habit_reminders(habit)
+        return habit
+
+    def update(self, instance, validated_data):
+        habit = super().update(instance, validated_data)
+        if {"reminder", "reminder_times", "repeat_days"}.intersection(validated_data):
+            sync_habit_reminders(habit)
+        return habit
+
     def _get_context_date(self):
         context_date = self.context.get("date")
         if isinstance(context_date, date):
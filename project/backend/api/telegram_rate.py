@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_GLOBAL_RATE = 25
+TELEGRAM_GLOBAL_BURST = 25
+TELEGRAM_CHAT_RATE = 1
+TELEGRAM_CHAT_BURST = 3
+TELEGRAM_MAX_WAIT_SECONDS = 3
+TELEGRAM_RATE_GLOBAL_KEY = "tg:rate:global"
+TELEGRAM_RATE_CHAT_KEY = "tg:rate:chat:{chat_id}"
+TELEGRAM_RATE_PAUSE_KEY = "tg:rate:pause"
+TELEGRAM_RATE_REDIS_RETRY_SECONDS = 30
+LOCAL_BUCKETS_MAX = 10000
+
+# Takes one token from the global bucket and, when given, the chat bucket, or returns the wait in ms.
+_TOKEN_BUCKET_LUA = """
+local pause = redis.call('PTTL', KEYS[3])
+if pause > 0 then
+    return pause
+end
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+
+local function level(key, rate, burst)
+    local data = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(data[1])
+    local ts = tonumber(data[2])
+    if tokens == nil or ts == nil then
+        return burst
+    end
+    return math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+end
+
+local global_rate = tonumber(ARGV[1])
+local global_burst = tonumber(ARGV[2])
+local global_tokens = level(KEYS[1], global_rate, global_burst)
+local wait = 0
+if global_tokens < 1 then
+    wait = math.ceil((1 - global_tokens) * 1000 / global_rate)
+end
+
+local chat_rate = tonumber(ARGV[3])
+local chat_burst = tonumber(ARGV[4])
+local chat_tokens = nil
+if KEYS[2] ~= '' then
+    chat_tokens = level(KEYS[2], chat_rate, chat_burst)
+    if chat_tokens < 1 then
+        wait = math.max(wait, math.ceil((1 - chat_tokens) * 1000 / chat_rate))
+    end
+end
+if wait > 0 then
+    return wait
+end
+
+redis.call('HSET', KEYS[1], 'tokens', global_tokens - 1, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(global_burst * 1000 / global_rate) + 1000)
+if chat_tokens ~= nil then
+    redis.call('HSET', KEYS[2], 'tokens', chat_tokens - 1, 'ts', now)
+    redis.call('PEXPIRE', KEYS[2], math.ceil(chat_burst * 1000 / chat_rate) + 1000)
+end
+return 0
+"""
+
+_local_lock = threading.Lock()
+_local_state: dict = {"buckets": {}, "paused_until": 0.0}
+_script_state: dict = {"client": None, "script": None, "down_until": 0.0}
+
+
+def _get_script():
+    if _script_state["down_until"] > time.monotonic():
+        return None
+    try:
+        redis = get_redis_connection("default")
+    except Exception:
+        return None
+    if _script_state["client"] is not redis:
+        _script_state["client"] = redis
+        _script_state["script"] = redis.register_script(_TOKEN_BUCKET_LUA)
+    return _script_state["script"]
+
+
+def _local_take(key: str, rate: float, burst: float, now: float) -> tuple[float, float]:
+    tokens, ts = _local_state["buckets"].get(key, (burst, now))
+    tokens = min(burst, tokens + max(0.0, now - ts) * rate)
+    wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+    return tokens, wait
+
+
+def _local_reserve(chat_id: int | str | None) -> float:
+    now = time.monotonic()
+    with _local_lock:
+        if _local_state["paused_until"] > now:
+            return _local_state["paused_until"] - now
+        buckets = _local_state["buckets"]
+        global_tokens, wait = _local_take("global", TELEGRAM_GLOBAL_RATE, TELEGRAM_GLOBAL_BURST, now)
+        chat_tokens = None
+        if chat_id is not None:
+            chat_tokens, chat_wait = _local_take(str(chat_id), TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST, now)
+            wait = max(wait, chat_wait)
+        if wait > 0:
+            return wait
+        if len(buckets) > LOCAL_BUCKETS_MAX:
+            buckets.clear()
+        buckets["global"] = (global_tokens - 1, now)
+        if chat_tokens is not None:
+            buckets[str(chat_id)] = (chat_tokens - 1, now)
+        return 0.0
+
+
+def reserve(chat_id: int | str | None = None) -> float:
+    script = _get_script()
+    if script is not None:
+        chat_key = TELEGRAM_RATE_CHAT_KEY.format(chat_id=chat_id) if chat_id is not None else ""
+        try:
+            wait_ms = script(
+                keys=[TELEGRAM_RATE_GLOBAL_KEY, chat_key, TELEGRAM_RATE_PAUSE_KEY],
+                args=[TELEGRAM_GLOBAL_RATE, TELEGRAM_GLOBAL_BURST, TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST],
+            )
+            return int(wait_ms) / 1000
+        except Exception as exc:
+            _script_state["down_until"] = time.monotonic() + TELEGRAM_RATE_REDIS_RETRY_SECONDS
+            logger.warning("Telegram rate limiter fell back to local buckets: %s", exc)
+    return _local_reserve(chat_id)
+
+
+def pause(seconds: float) -> None:
+    seconds = max(float(seconds), 0.0)
+    if not seconds:
+        return
+    with _local_lock:
+        _local_state["paused_until"] = max(_local_state["paused_until"], time.monotonic() + seconds)
+    try:
+        get_redis_connection("default").set(TELEGRAM_RATE_PAUSE_KEY, "1", px=math.ceil(seconds * 1000))
+    except Exception as exc:
+        logger.warning("Failed to share Telegram flood wait: %s", exc)
+
+
+def pause_on_flood(data) -> None:
+    if not isinstance(data, dict) or data.get("error_code") != 429:
+        return
+    parameters = data.get("parameters") or {}
+    try:
+        pause(float(parameters.get("retry_after", 1)))
+    except (TypeError, ValueError):
+        pause(1)
+
+
+def wait_for_slot(chat_id: int | str | None = None, max_wait: float = TELEGRAM_MAX_WAIT_SECONDS) -> bool:
+    deadline = time.monotonic() + max_wait
+    while True:
+        wait = reserve(chat_id)
+        if wait <= 0:
+            return True
+        if time.monotonic() + wait > deadline:
+            return False
+        time.sleep(wait)
+
+
+async def wait_for_slot_async(chat_id: int | str | None = None, max_wait: float | None = None) -> bool:
+    deadline = None if max_wait is None else time.monotonic() + max_wait
+    while True:
+        wait = await sync_to_async(reserve, thread_sensitive=False)(chat_id)
+        if wait <= 0:
+            return True
+        if deadline is not None and time.monotonic() + wait > deadline:
+            return False
+        await asyncio.sleep(wait)
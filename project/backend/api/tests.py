@@ -1 +1,101 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import Habit, HabitCompletion, User
+
+
+@override_settings(ALLOWED_HOSTS=["*"])
+@mock.patch("api.views._get_redis", return_value=None)
+class HabitSyncXpTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(telegram_id=1, username="sync")
+        self.habit = Habit.objects.create(owner=self.user, title="Read", goal=1)
+        self.date = (timezone.localdate() - timedelta(days=10)).isoformat()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.events = 0
+
+    def _sync(self, delta):
+        self.events += 1
+        response = self.client.post(
+            "/v1/api/habits/sync/",
+            {
+                "events": [{
+                    "event_id": f"event-{self.events}",
+                    "habit_id": self.habit.id,
+                    "date": self.date,
+                    "delta": delta,
+                    "client_ts": timezone.now().isoformat(),
+                }],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_undo_redo_does_not_reaward_xp(self, _redis):
+        self.assertGreater(self._sync(1)["xp_awarded"], 0)
+        for _ in range(3):
+            self.assertEqual(self._sync(-1)["days"][0]["count"], 0)
+            # The daily cap resets with its cache key; the completion itself must not pay out again.
+            cache.clear()
+            data = self._sync(1)
+            self.assertEqual(data["days"][0]["count"], 1)
+            self.assertEqual(data["xp_awarded"], 0)
+        self.assertTrue(HabitCompletion.objects.get(habit=self.habit).xp_awarded)
+
+    def test_complete_after_undo_does_not_reaward_xp(self, _redis):
+        self._sync(1)
+        self._sync(-1)
+        cache.clear()
+        response = self.client.post(f"/v1/api/habits/{self.habit.id}/complete/", {"date": self.date}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(HabitCompletion.objects.get(habit=self.habit).count, 1)
+        self.assertEqual(response.data.get("xp_awarded", 0), 0)
+
+    def test_sync_accepts_bare_event_list(self, _redis):
+        response = self.client.post(
+            "/v1/api/habits/sync/",
+            [{
+                "event_id": "bare-1",
+                "habit_id": self.habit.id,
+                "date": self.date,
+                "delta": 1,
+                "client_ts": timezone.now().isoformat(),
+            }],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["applied"], ["bare-1"])
+        response = self.client.post("/v1/api/habits/sync/", "events", format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(ALLOWED_HOSTS=["*"])
+@mock.patch("api.views._get_redis", return_value=None)
+class HabitCompleteBatchBodyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(telegram_id=2, username="batch")
+        self.habit = Habit.objects.create(owner=self.user, title="Walk", goal=2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_accepts_bare_list_and_items_object(self, _redis):
+        item = {"habit_id": self.habit.id, "count": 1}
+        response = self.client.post("/v1/api/habits/complete-batch/", [item], format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["count"], 1)
+        response = self.client.post("/v1/api/habits/complete-batch/", {"items": [item]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["count"], 2)
+
+    def test_rejects_non_list_body(self, _redis):
+        response = self.client.post("/v1/api/habits/complete-batch/", "items", format="json")
+        self.assertEqual(response.status_code, 400)
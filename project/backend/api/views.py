@@ -9,14 +9,16 @@ import requests
 from datetime import date, datetime, time, timedelta, timezone as dt_timezone
 from decimal import Decimal, InvalidOperation
 from difflib import SequenceMatcher
+from time import sleep
 from urllib.parse import parse_qsl, unquote, parse_qs
 
 from django.conf import settings
 from django.core.cache import cache
-from django.db import transaction
-from django.db.models import Case, Count, Exists, F, IntegerField, OuterRef, Prefetch, Q, Sum, When
+from django.db import connection, transaction
+from django.db.models import Case, Count, Exists, F, IntegerField, OuterRef, Prefetch, Q, Subquery, Sum, When
 from django.http import HttpResponse, HttpResponseRedirect
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.views.decorators.csrf import csrf_exempt
 from django_redis import get_redis_connection
 from rest_framework import status, viewsets
@@ -27,12 +29,24 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from backend.webapp_auth import WebAppAuth, AuthError as WebAppAuthError
+from .catalog import (
+    get_active_products,
+    get_active_quests,
+    get_categories,
+    get_quest_group_requirements,
+    get_title,
+    get_titles,
+)
+from .idempotency import idempotent
 from .models import (
     Category,
     Habit,
     HabitCopy,
     HabitCompletion,
+    HabitCompletionEvent,
     HabitShare,
+    LeaderboardRank,
+    LeaderboardSnapshot,
     Payment,
     Product,
     Quest,
@@ -40,7 +54,10 @@ from .models import (
     User,
     UserQuest,
     XpIntervalTransaction,
+    XpTransaction,
+    weekday_bit,
 )
+from .telegram_rate import pause_on_flood, wait_for_slot
 from .serializers import (
     CategorySerializer,
     HabitSerializer,
@@ -72,8 +89,35 @@ class AuthError(Exception):
 XP_BASE = 10
 PREMIUM_XP_MULTIPLIER = 1.3
 LEADERBOARD_CACHE_TTL_SECONDS = 60 * 5
+LEADERBOARD_CACHE_STALE_TTL_SECONDS = 60 * 30
+LEADERBOARD_CACHE_REFRESH_AHEAD_SECONDS = 30
+LEADERBOARD_CACHE_KEY = "xp:leaderboard:items:v6:{range}:{limit}"
+LEADERBOARD_RANK_REFRESH_SECONDS = 60 * 10
+LEADERBOARD_RANK_REFRESHED_KEY = "xp:leaderboard:ranks:{range}:refreshed_at"
+LEADERBOARD_RANK_BATCH_SIZE = 2000
+CACHE_REBUILD_LOCK_TTL_SECONDS = 30
+CACHE_REBUILD_POLL_SECONDS = 0.05
 LEADERBOARD_DEFAULT_LIMIT = 10
 LEADERBOARD_MAX_LIMIT = 100
+LEADERBOARD_DEFAULT_RADIUS = 5
+LEADERBOARD_MAX_RADIUS = 50
+LEADERBOARD_HISTORY_TOP_K = 100
+LEADERBOARD_HISTORY_PAGE_SIZE = 12
+LEADERBOARD_HISTORY_WINNERS = 3
+HABIT_LEADERBOARD_CACHE_KEY = "habit:leaderboard:v1:{source}:{metric}:{range}"
+HABIT_LEADERBOARD_CACHE_TTL_SECONDS = 60
+HABIT_LEADERBOARD_METRICS = ("completions", "streak")
+HABIT_LEADERBOARD_RANGE_DAYS = {"week": 7, "month": 30}
+LEADERBOARD_USER_FIELDS = (
+    "id",
+    "first_name",
+    "username",
+    "photo_url",
+    "level",
+    "xp",
+    "premium_expiration",
+    "current_title_id",
+)
 XP_FLUSH_INTERVAL_SECONDS = 60 * 60 * 3
 XP_FLUSH_LOCK_TTL_SECONDS = 120
 XP_FLUSH_LOCK_KEY = "xp:flush:lock"
@@ -83,6 +127,13 @@ XP_BUCKET_KEY_RE = re.compile(r"^xp:bucket:3h:(\d+)$")
 XP_PENDING_PERIOD_BUCKET_PREFIX = "xp:pending:{range}:bucket:"
 XP_PENDING_PERIOD_INDEX_KEY = "xp:pending:{range}:index"
 XP_PENDING_USER_TOTAL_KEY = "xp:pending:user:{user_id}:total"
+XP_INTERVAL_RETENTION_DAYS = 31
+HABIT_COMPLETE_BATCH_MAX_ITEMS = 100
+HABIT_SYNC_MAX_EVENTS = 500
+XP_INTERVAL_COMPACT_MAX_DAYS = 14
+XP_INTERVAL_COMPACTED_KEY = "xp:intervals:compacted_through"
+TITLE_SYNC_PENDING_KEY = "xp:title:sync:pending"
+TITLE_SYNC_BATCH_SIZE = 500
 
 
 def _notify_telegram_payment_success(*, telegram_id: int | None, product_name: str) -> None:
@@ -93,8 +144,13 @@ def _notify_telegram_payment_success(*, telegram_id: int | None, product_name: s
         "chat_id": int(telegram_id),
         "text": f"Оплата успешно подтверждена.\nПакет: {product_name}",
     }
+    if not wait_for_slot(payload["chat_id"]):
+        logger.warning("Skipped payment success Telegram message, rate limited: telegram_id=%s", telegram_id)
+        return
     try:
-        requests.post(url, json=payload, timeout=5)
+        response = requests.post(url, json=payload, timeout=5)
+        if response.status_code == 429:
+            pause_on_flood(response.json())
     except Exception as exc:
         logger.warning(
             "Failed to send payment success Telegram message: telegram_id=%s error=%s",
@@ -113,11 +169,14 @@ def _telegram_send_message(*, chat_id: int, text: str, reply_markup: dict | None
     }
     if reply_markup:
         payload["reply_markup"] = reply_markup
+    if not wait_for_slot(payload["chat_id"]):
+        raise ValidationError({"detail": "Telegram rate limit reached, try again later"})
     try:
         response = requests.post(url, json=payload, timeout=8)
         data = response.json() if response.content else {}
     except Exception as exc:
         raise ValidationError({"detail": f"Failed to send Telegram message: {exc}"}) from exc
+    pause_on_flood(data)
     if not response.ok or not data.get("ok"):
         description = data.get("description") or f"HTTP {response.status_code}"
         raise ValidationError({"detail": f"Telegram sendMessage failed: {description}"})
@@ -135,12 +194,16 @@ def _telegram_edit_message(*, chat_id: int, message_id: int, text: str, reply_ma
     }
     if reply_markup is not None:
         payload["reply_markup"] = reply_markup
+    if not wait_for_slot(payload["chat_id"]):
+        logger.warning("Skipped Telegram message edit, rate limited: chat_id=%s message_id=%s", chat_id, message_id)
+        return
     try:
         response = requests.post(url, json=payload, timeout=8)
         data = response.json() if response.content else {}
     except Exception as exc:
         logger.warning("Failed to edit Telegram message: chat_id=%s message_id=%s error=%s", chat_id, message_id, exc)
         return
+    pause_on_flood(data)
     if not response.ok or not data.get("ok"):
         description = data.get("description") or f"HTTP {response.status_code}"
         logger.warning("Telegram editMessageText failed: chat_id=%s message_id=%s error=%s", chat_id, message_id, description)
@@ -277,43 +340,56 @@ def _level_from_total_xp(total_xp: int) -> int:
 
 
 def _resolve_title(user: User) -> Title | None:
-    if user.current_title_id:
+    current_title = get_title(user.current_title_id)
+    if current_title:
         is_premium = bool(user.premium_expiration and user.premium_expiration > timezone.now())
-        if user.current_title.requires_premium and not is_premium:
+        if current_title.requires_premium and not is_premium:
             return _sync_user_title(user, save=True)
-        return user.current_title
+        return current_title
     return _sync_user_title(user, save=True)
 
 
-def _has_completed_all_group_quests(user: User, group_code: str) -> bool:
-    required_ids = list(Quest.objects.filter(is_active=True, group=group_code).values_list("id", flat=True))
-    if not required_ids:
-        return True
-    completed_count = UserQuest.objects.filter(user=user, quest_id__in=required_ids).count()
-    return completed_count == len(required_ids)
-
-
-def _determine_user_title(user: User) -> Title | None:
-    is_premium = bool(user.premium_expiration and user.premium_expiration > timezone.now())
-    titles_qs = Title.objects.all().order_by("order")
-    if not is_premium:
-        titles_qs = titles_qs.filter(requires_premium=False)
-    titles = list(titles_qs)
+def _title_for_progress(level: int, is_premium: bool, completed_quest_ids: set[int] | frozenset[int]) -> Title | None:
+    titles = [title for title in get_titles() if is_premium or not title.requires_premium]
     if not titles:
         return None
 
-    level = user.level or 1
+    requirements = get_quest_group_requirements()
     current = titles[0]
     for next_title in titles[1:]:
         can_level_up = level > current.level_max
         if not can_level_up:
             break
-        if not _has_completed_all_group_quests(user, current.code):
+        if not requirements.get(current.code, frozenset()) <= completed_quest_ids:
             break
         current = next_title
     return current
 
 
+def _get_completed_quest_ids_map(user_ids) -> dict[int, set[int]]:
+    result: dict[int, set[int]] = {int(user_id): set() for user_id in user_ids}
+    if not result:
+        return result
+    rows = UserQuest.objects.filter(user_id__in=list(result.keys())).values_list("user_id", "quest_id")
+    for user_id, quest_id in rows:
+        result[user_id].add(quest_id)
+    return result
+
+
+def _determine_user_title(user: User, completed_quest_ids: set[int] | None = None) -> Title | None:
+    if completed_quest_ids is None:
+        completed_quest_ids = set(UserQuest.objects.filter(user_id=user.id).values_list("quest_id", flat=True))
+    return _title_for_progress(int(user.level or 1), _is_premium_active(user), completed_quest_ids)
+
+
+def _determine_user_titles(users: list[User]) -> dict[int, Title | None]:
+    completed_map = _get_completed_quest_ids_map(u.id for u in users)
+    return {
+        u.id: _title_for_progress(int(u.level or 1), _is_premium_active(u), completed_map.get(u.id, set()))
+        for u in users
+    }
+
+
 def _sync_user_title(user: User, *, save: bool = True) -> Title | None:
     target = _determine_user_title(user)
     target_id = target.id if target else None
@@ -324,6 +400,19 @@ def _sync_user_title(user: User, *, save: bool = True) -> Title | None:
     return target
 
 
+def _sync_user_titles(users: list[User]) -> None:
+    targets = _determine_user_titles(users)
+    changed: dict[int | None, list[int]] = {}
+    for u in users:
+        target = targets.get(u.id)
+        target_id = target.id if target else None
+        if u.current_title_id != target_id:
+            u.current_title = target
+            changed.setdefault(target_id, []).append(u.id)
+    for target_id, user_ids in changed.items():
+        User.objects.filter(id__in=user_ids).update(current_title_id=target_id)
+
+
 def _get_stats_days_limit(user: User) -> int:
     title = _resolve_title(user)
     if not title:
@@ -579,6 +668,70 @@ def _active_habits_queryset(user: User, today: date):
     )
 
 
+def _habit_completion_error(habit: Habit, completion_date: date, today: date) -> str | None:
+    if completion_date > today:
+        return "Cannot complete habit for a future date"
+    if habit.is_archived:
+        return "Habit is archived"
+    if habit.end_date and completion_date > habit.end_date:
+        return "Habit is no longer active"
+    if not habit.repeat_mask & weekday_bit(completion_date):
+        return "Habit is not scheduled for this day"
+    return None
+
+
+def _request_list(request, key: str):
+    if isinstance(request.data, list):
+        return request.data
+    if isinstance(request.data, dict):
+        return request.data.get(key)
+    return None
+
+
+def _apply_habit_completion(habit: Habit, completion_date: date, increment: int) -> tuple[int, int, int, bool]:
+    completion, _created = HabitCompletion.objects.select_for_update().get_or_create(
+        habit=habit, date=completion_date
+    )
+    goal = max(habit.goal, 1)
+    prev_count = completion.count
+    new_count = min(goal, completion.count + increment)
+    newly_completed = new_count >= goal and not completion.xp_awarded
+    if new_count != prev_count or newly_completed:
+        completion.count = new_count
+        completion.xp_awarded = completion.xp_awarded or newly_completed
+        completion.save(update_fields=["count", "xp_awarded"])
+    return prev_count, new_count, goal, newly_completed
+
+
+def _award_completion_xp(user: User, completion_date: date, newly_completed: int) -> int:
+    streak_days = _calculate_streak_days(user, completion_date)
+    multiplier = _get_streak_multiplier(streak_days)
+    raw_xp = newly_completed * int(round(XP_BASE * multiplier))
+    habits_today = (
+        HabitCompletion.objects.filter(
+            habit__owner=user, date=completion_date, count__gte=F("habit__goal")
+        )
+        .values("habit_id")
+        .distinct()
+        .count()
+    )
+    return _award_xp(user, raw_xp, completion_date, habits_today)
+
+
+def _parse_client_ts(value) -> datetime | None:
+    try:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return datetime.fromtimestamp(value / 1000, tz=dt_timezone.utc)
+        if not isinstance(value, str):
+            return None
+        parsed = parse_datetime(value)
+    except (ValueError, OverflowError, OSError):
+        return None
+    if parsed and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
 def _get_redis():
     try:
         redis = get_redis_connection("default")
@@ -602,6 +755,70 @@ def _cache_set_safe(key: str, value, timeout: int) -> None:
         return
 
 
+def _cache_add_safe(key: str, value, timeout: int) -> bool:
+    try:
+        return bool(cache.add(key, value, timeout=timeout))
+    except Exception:
+        return True
+
+
+def _cache_delete_safe(key: str) -> None:
+    try:
+        cache.delete(key)
+    except Exception:
+        return
+
+
+def _cache_rebuild_locked(key: str, builder, soft_ttl: int, hard_ttl: int, lock_token: str):
+    lock_key = f"{key}:lock"
+    try:
+        value = builder()
+        envelope = {"value": value, "fresh_until": timezone.now().timestamp() + soft_ttl}
+        _cache_set_safe(key, envelope, timeout=hard_ttl)
+        return value
+    finally:
+        if _cache_get_safe(lock_key) == lock_token:
+            _cache_delete_safe(lock_key)
+
+
+def _cache_refresh(key: str, builder, *, soft_ttl: int, hard_ttl: int, refresh_ahead: int = 0, force: bool = False):
+    envelope = None if force else _cache_get_safe(key)
+    if isinstance(envelope, dict) and "value" in envelope:
+        if timezone.now().timestamp() < float(envelope.get("fresh_until") or 0) - refresh_ahead:
+            return envelope["value"]
+    lock_token = str(uuid.uuid4())
+    if not _cache_add_safe(f"{key}:lock", lock_token, timeout=CACHE_REBUILD_LOCK_TTL_SECONDS):
+        return None
+    return _cache_rebuild_locked(key, builder, soft_ttl, hard_ttl, lock_token)
+
+
+def _cache_get_or_rebuild(key: str, builder, *, soft_ttl: int, hard_ttl: int, refresh_ahead: int = 0):
+    envelope = _cache_get_safe(key)
+    lock_key = f"{key}:lock"
+    lock_token = str(uuid.uuid4())
+    if isinstance(envelope, dict) and "value" in envelope:
+        fresh_until = float(envelope.get("fresh_until") or 0)
+        if timezone.now().timestamp() < fresh_until - refresh_ahead:
+            return envelope["value"]
+        if not _cache_add_safe(lock_key, lock_token, timeout=CACHE_REBUILD_LOCK_TTL_SECONDS):
+            return envelope["value"]
+        return _cache_rebuild_locked(key, builder, soft_ttl, hard_ttl, lock_token)
+
+    if _cache_add_safe(lock_key, lock_token, timeout=CACHE_REBUILD_LOCK_TTL_SECONDS):
+        return _cache_rebuild_locked(key, builder, soft_ttl, hard_ttl, lock_token)
+
+    waited = 0.0
+    while waited < CACHE_REBUILD_LOCK_TTL_SECONDS:
+        sleep(CACHE_REBUILD_POLL_SECONDS)
+        waited += CACHE_REBUILD_POLL_SECONDS
+        envelope = _cache_get_safe(key)
+        if isinstance(envelope, dict) and "value" in envelope:
+            return envelope["value"]
+        if _cache_add_safe(lock_key, lock_token, timeout=CACHE_REBUILD_LOCK_TTL_SECONDS):
+            return _cache_rebuild_locked(key, builder, soft_ttl, hard_ttl, lock_token)
+    return builder()
+
+
 def _int_from_redis(value, default: int = 0) -> int:
     if value is None:
         return default
@@ -680,6 +897,14 @@ def _pending_period_bucket_keys_in_window(redis, range_key: str, start_dt: datet
     return keys
 
 
+def _has_pending_xp_between(redis, start_dt: datetime, end_dt: datetime) -> bool:
+    for key in _scan_keys(redis, f"{XP_BUCKET_KEY_PREFIX}*"):
+        bucket_start = _bucket_start_from_key(key)
+        if bucket_start and start_dt <= bucket_start < end_dt:
+            return True
+    return False
+
+
 def _incr_pending_user_total(redis, user_id: int, delta: int) -> None:
     if delta == 0:
         return
@@ -730,6 +955,32 @@ def _persist_interval_xp_without_redis(user_id: int, awarded: int, now_dt: datet
         _sync_user_title(u, save=True)
 
 
+def _upsert_interval_xp(rows: list[tuple[int, datetime, datetime, int]]) -> None:
+    # Late buckets can land on an already compacted daily row that shares their period_start, so merge, never drop.
+    qn = connection.ops.quote_name
+    table = qn(XpIntervalTransaction._meta.db_table)
+    sql = f"""
+        INSERT INTO {table} ({qn("user_id")}, {qn("period_start")}, {qn("period_end")}, {qn("xp")}, {qn("created_at")})
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT ({qn("user_id")}, {qn("period_start")}) DO UPDATE SET
+            {qn("xp")} = {table}.{qn("xp")} + excluded.{qn("xp")}
+    """
+    created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    params = [
+        (
+            user_id,
+            connection.ops.adapt_datetimefield_value(period_start),
+            connection.ops.adapt_datetimefield_value(period_end),
+            xp,
+            created_at,
+        )
+        for user_id, period_start, period_end, xp in rows
+    ]
+    with connection.cursor() as cursor:
+        for i in range(0, len(params), LEADERBOARD_RANK_BATCH_SIZE):
+            cursor.executemany(sql, params[i : i + LEADERBOARD_RANK_BATCH_SIZE])
+
+
 def _flush_pending_xp_to_db(redis, *, force: bool = False) -> bool:
     lock_token = str(uuid.uuid4())
     lock_ok = redis.set(XP_FLUSH_LOCK_KEY, lock_token, nx=True, ex=XP_FLUSH_LOCK_TTL_SECONDS)
@@ -756,7 +1007,7 @@ def _flush_pending_xp_to_db(redis, *, force: bool = False) -> bool:
             return False
 
         user_increments: dict[int, int] = {}
-        tx_to_create: list[XpIntervalTransaction] = []
+        tx_to_create: list[tuple[int, datetime, datetime, int]] = []
         for key, bucket_start in ordered_keys:
             raw = redis.hgetall(key) or {}
             if not raw:
@@ -767,28 +1018,24 @@ def _flush_pending_xp_to_db(redis, *, force: bool = False) -> bool:
                 xp_value = _int_from_redis(xp_raw)
                 if user_id <= 0 or xp_value <= 0:
                     continue
-                tx_to_create.append(
-                    XpIntervalTransaction(
-                        user_id=user_id,
-                        period_start=bucket_start,
-                        period_end=period_end,
-                        xp=xp_value,
-                    )
-                )
+                tx_to_create.append((user_id, bucket_start, period_end, xp_value))
                 user_increments[user_id] = user_increments.get(user_id, 0) + xp_value
 
         if tx_to_create:
-            XpIntervalTransaction.objects.bulk_create(tx_to_create, ignore_conflicts=True)
+            _upsert_interval_xp(tx_to_create)
         if user_increments:
             for user_id, delta in user_increments.items():
                 User.objects.filter(id=user_id).update(xp=F("xp") + delta)
             affected = list(User.objects.filter(id__in=user_increments.keys()))
+            leveled = []
             for u in affected:
                 new_level = _level_from_total_xp(int(u.xp or 0))
                 if int(u.level or 1) != new_level:
                     u.level = new_level
-                    u.save(update_fields=["level"])
-                _sync_user_title(u, save=True)
+                    leveled.append(u)
+            if leveled:
+                User.objects.bulk_update(leveled, ["level"], batch_size=500)
+            _sync_user_titles(affected)
 
         if ordered_keys:
             flushed_stamps = [str(int(bucket_start.timestamp())) for _, bucket_start in ordered_keys]
@@ -811,6 +1058,59 @@ def _flush_pending_xp_to_db(redis, *, force: bool = False) -> bool:
             redis.delete(XP_FLUSH_LOCK_KEY)
 
 
+def _raw_xp_intervals():
+    return XpIntervalTransaction.objects.filter(period_end__lt=F("period_start") + timedelta(days=1))
+
+
+def _compact_xp_intervals_day(day: date) -> int:
+    tz = timezone.get_current_timezone()
+    day_start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    day_end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min), tz)
+    with transaction.atomic():
+        day_rows = XpIntervalTransaction.objects.select_for_update().filter(
+            period_start__gte=day_start,
+            period_start__lt=day_end,
+        )
+        totals = list(day_rows.values("user_id").annotate(total=Sum("xp")).values_list("user_id", "total"))
+        deleted, _ = day_rows.delete()
+        XpIntervalTransaction.objects.bulk_create(
+            [
+                XpIntervalTransaction(user_id=user_id, period_start=day_start, period_end=day_end, xp=int(total or 0))
+                for user_id, total in totals
+                if int(total or 0) > 0
+            ],
+            batch_size=LEADERBOARD_RANK_BATCH_SIZE,
+        )
+    return deleted - len(totals)
+
+
+def _compact_xp_intervals(
+    retention_days: int = XP_INTERVAL_RETENTION_DAYS,
+    max_days: int = XP_INTERVAL_COMPACT_MAX_DAYS,
+) -> tuple[int, int]:
+    cutoff_day = timezone.localdate() - timedelta(days=max(retention_days, 31))
+    cutoff_dt = timezone.make_aware(datetime.combine(cutoff_day, time.min), timezone.get_current_timezone())
+    candidates = _raw_xp_intervals().filter(period_start__lt=cutoff_dt)
+    compacted_through = _cache_get_safe(XP_INTERVAL_COMPACTED_KEY)
+    if compacted_through:
+        # Buckets can still be flushed late for as long as they live in Redis.
+        late_window = timedelta(seconds=XP_BUCKET_TTL_SECONDS) - timedelta(days=max(retention_days, 31))
+        scan_from = date.fromisoformat(compacted_through) - max(late_window, timedelta(days=1))
+        candidates = candidates.filter(
+            period_start__gte=timezone.make_aware(datetime.combine(scan_from, time.min), timezone.get_current_timezone())
+        )
+    compacted_days = 0
+    removed_rows = 0
+    while compacted_days < max_days:
+        oldest = candidates.order_by("period_start").first()
+        if not oldest:
+            _cache_set_safe(XP_INTERVAL_COMPACTED_KEY, cutoff_day.isoformat(), timeout=XP_BUCKET_TTL_SECONDS)
+            break
+        removed_rows += _compact_xp_intervals_day(timezone.localtime(oldest.period_start).date())
+        compacted_days += 1
+    return compacted_days, removed_rows
+
+
 def _maybe_flush_pending_xp(redis) -> None:
     try:
         _flush_pending_xp_to_db(redis, force=False)
@@ -999,15 +1299,57 @@ def _get_db_period_scores_map(range_key: str, target_date: date) -> dict[int, in
     return {int(row["user_id"]): int(row["total"] or 0) for row in rows}
 
 
+def _get_db_user_period_xp(user_id: int, range_key: str) -> int:
+    bounds = _period_bounds(range_key)
+    if not bounds:
+        return 0
+    start_dt, end_dt = bounds
+    total = XpIntervalTransaction.objects.filter(
+        user_id=user_id,
+        period_start__gte=start_dt,
+        period_start__lt=end_dt,
+    ).aggregate(total=Sum("xp"))["total"]
+    return int(total or 0)
+
+
+def _get_pending_user_period_xp(redis, user_id: int, range_key: str) -> int:
+    if not redis:
+        return 0
+    bounds = _period_bounds(range_key)
+    if not bounds:
+        return 0
+    start_dt, end_dt = bounds
+    member = str(int(user_id))
+    try:
+        keys = _pending_period_bucket_keys_in_window(redis, range_key, start_dt, end_dt)
+        if keys:
+            pipe = redis.pipeline(transaction=False)
+            for key in keys:
+                pipe.zscore(key, member)
+            return int(sum(int(score or 0) for score in pipe.execute()))
+
+        total = 0
+        for key in _scan_keys(redis, f"{XP_BUCKET_KEY_PREFIX}*"):
+            bucket_start = _bucket_start_from_key(key)
+            if not bucket_start:
+                continue
+            if bucket_start < start_dt or bucket_start >= end_dt:
+                continue
+            total += _int_from_redis(redis.hget(key, member), 0)
+        return int(total)
+    except Exception:
+        return 0
+
+
 def _get_user_period_xp(user: User, range_key: str, target_date: date) -> int:
     if range_key not in {"week", "month"}:
         return int(user.xp or 0)
     redis = _get_redis()
     if redis:
         _maybe_flush_pending_xp(redis)
-    db_scores = _get_db_period_scores_map(range_key, target_date)
-    pending_scores = _get_pending_period_map(redis, range_key, target_date) if redis else {}
-    return int(db_scores.get(user.id, 0) + pending_scores.get(user.id, 0))
+    db_xp = _get_db_user_period_xp(user.id, range_key)
+    pending_xp = _get_pending_user_period_xp(redis, user.id, range_key) if redis else 0
+    return int(db_xp + pending_xp)
 
 
 def _get_month_xp(user: User, target_date: date) -> int:
@@ -1042,6 +1384,31 @@ def _get_user_live_xp(user: User) -> int:
     return int(base_xp + pending_xp)
 
 
+def _wants_minimal_response(request) -> bool:
+    if request.query_params.get("fields") == "minimal":
+        return True
+    prefer = request.headers.get("Prefer", "")
+    return any(part.strip() == "return=minimal" for part in prefer.split(","))
+
+
+def _minimal_user_progress(user: User, awarded_xp: int = 0) -> dict:
+    xp_value = int(user.xp or 0)
+    redis = _get_redis()
+    if redis:
+        try:
+            xp_value += _int_from_redis(redis.get(_pending_user_total_key(user.id)), 0)
+        except Exception:
+            pass
+    else:
+        xp_value += int(awarded_xp or 0)
+    title = get_title(user.current_title_id)
+    return {
+        "xp": xp_value,
+        "level": int(user.level or 1),
+        "title": title.name if title else "",
+    }
+
+
 def _serialize_user_with_live_xp(user: User) -> dict:
     payload = UserSerializer(user).data
     payload["xp"] = _get_user_live_xp(user)
@@ -1050,13 +1417,13 @@ def _serialize_user_with_live_xp(user: User) -> dict:
 
 def _check_and_award_quests(user: User, target_date: date | None = None) -> list[UserQuest]:
     target_date = target_date or timezone.localdate()
-    active_quests = list(Quest.objects.filter(is_active=True).order_by("order"))
+    active_quests = sorted(get_active_quests(), key=lambda quest: quest.order)
     if not active_quests:
         return []
 
     completed_map = {
         uq.quest_id: uq
-        for uq in UserQuest.objects.filter(user=user, quest__in=active_quests)
+        for uq in UserQuest.objects.filter(user=user, quest_id__in=[quest.id for quest in active_quests])
     }
 
     habits_count = Habit.objects.filter(owner=user).count()
@@ -1337,7 +1704,7 @@ def get_public_user_profile(request, user_id: int):
 def _serialize_titles(user: User) -> list[dict]:
     is_premium = bool(user.premium_expiration and user.premium_expiration > timezone.now())
     current_title = _resolve_title(user)
-    titles = Title.objects.all().order_by("order")
+    titles = get_titles()
     data = []
     for title in titles:
         is_locked = title.requires_premium and not is_premium
@@ -1457,12 +1824,12 @@ def _build_quests_progress_map(user: User, quests: list[Quest], target_date: dat
 
 
 def _serialize_quests(user: User) -> list[dict]:
-    quests = list(Quest.objects.filter(is_active=True).order_by("group", "order"))
+    quests = list(get_active_quests())
     today = timezone.localdate()
     progress_map = _build_quests_progress_map(user, quests, today)
     completed_map = {
         uq.quest_id: uq
-        for uq in UserQuest.objects.filter(user=user, quest__in=quests)
+        for uq in UserQuest.objects.filter(user=user, quest_id__in=[quest.id for quest in quests])
     }
     items = []
     for quest in quests:
@@ -1521,8 +1888,53 @@ def _normalize_leaderboard_range(range_key: str | None) -> str:
     return "month"
 
 
-def _serialize_leaderboard_user(u: User, rank: int, xp_value: int) -> dict:
-    title = _resolve_title(u)
+def _defer_user_title_sync(users: list[User]) -> None:
+    if not users:
+        return
+    redis = _get_redis()
+    if redis:
+        try:
+            redis.sadd(TITLE_SYNC_PENDING_KEY, *[int(u.id) for u in users])
+            return
+        except Exception:
+            pass
+    _sync_user_titles(users)
+
+
+def _process_deferred_title_syncs(redis) -> int:
+    processed = 0
+    while True:
+        raw_ids = redis.spop(TITLE_SYNC_PENDING_KEY, TITLE_SYNC_BATCH_SIZE) or []
+        user_ids = [_int_from_redis(raw) for raw in raw_ids]
+        user_ids = [user_id for user_id in user_ids if user_id > 0]
+        if not user_ids:
+            return processed
+        _sync_user_titles(list(User.objects.filter(id__in=user_ids)))
+        processed += len(user_ids)
+
+
+def _leaderboard_titles(users: list[User]) -> dict[int, Title | None]:
+    titles: dict[int, Title | None] = {}
+    unresolved: list[User] = []
+    for u in users:
+        stored = get_title(u.current_title_id)
+        if stored and not (stored.requires_premium and not _is_premium_active(u)):
+            titles[u.id] = stored
+        else:
+            unresolved.append(u)
+    if unresolved:
+        resolved = _determine_user_titles(unresolved)
+        titles.update(resolved)
+        stale = []
+        for u in unresolved:
+            target = resolved.get(u.id)
+            if (target.id if target else None) != u.current_title_id:
+                stale.append(u)
+        _defer_user_title_sync(stale)
+    return titles
+
+
+def _serialize_leaderboard_user(u: User, rank: int, xp_value: int, title: Title | None) -> dict:
     return {
         "id": u.id,
         "name": u.first_name or u.username or f"User {u.id}",
@@ -1536,7 +1948,7 @@ def _serialize_leaderboard_user(u: User, rank: int, xp_value: int) -> dict:
 
 
 def _serialize_leaderboard_me(user: User, xp_value: int, rank: int | None) -> dict:
-    title = _resolve_title(user)
+    title = _leaderboard_titles([user]).get(user.id)
     return {
         "id": user.id,
         "name": user.first_name or user.username or f"User {user.id}",
@@ -1550,15 +1962,24 @@ def _serialize_leaderboard_me(user: User, xp_value: int, rank: int | None) -> di
 
 
 def _build_items_from_users(users: list[User], score_map: dict[int, int], limit: int) -> list[dict]:
+    top_users = users[:limit]
+    titles = _leaderboard_titles(top_users)
     items = []
-    for index, u in enumerate(users[:limit], start=1):
-        items.append(_serialize_leaderboard_user(u, rank=index, xp_value=score_map.get(u.id, int(u.xp or 0))))
+    for index, u in enumerate(top_users, start=1):
+        items.append(_serialize_leaderboard_user(
+            u,
+            rank=index,
+            xp_value=score_map.get(u.id, int(u.xp or 0)),
+            title=titles.get(u.id),
+        ))
     return items
 
 
 def _build_period_ranking(range_key: str, today: date, redis=None) -> tuple[list[User], dict[int, int]]:
     users = list(
-        User.objects.filter(participation_in_ratings=True).order_by("-xp", "id")
+        User.objects.filter(participation_in_ratings=True)
+        .only(*LEADERBOARD_USER_FIELDS)
+        .order_by("-xp", "id")
     )
     db_scores = _get_db_period_scores_map(range_key, today)
     pending_scores = _get_pending_period_map(redis, range_key, today) if redis else {}
@@ -1576,14 +1997,45 @@ def _build_live_me_entry(user: User, range_key: str, today: date, ranking_users:
         return None
 
     if range_key == "all":
-        rank = (
-            User.objects.filter(participation_in_ratings=True, xp__gt=me_user.xp).count()
-            + User.objects.filter(participation_in_ratings=True, xp=me_user.xp, id__lt=me_user.id).count()
-            + 1
+        snapshot = (
+            LeaderboardRank.objects.filter(range_key="all", user_id=me_user.id)
+            .values_list("rank", "score")
+            .first()
         )
+        if snapshot and int(snapshot[1]) == int(me_user.xp or 0):
+            rank = int(snapshot[0])
+        else:
+            rank = (
+                User.objects.filter(participation_in_ratings=True, xp__gt=me_user.xp).count()
+                + User.objects.filter(participation_in_ratings=True, xp=me_user.xp, id__lt=me_user.id).count()
+                + 1
+            )
         return _serialize_leaderboard_me(me_user, xp_value=int(me_user.xp or 0), rank=rank)
 
-    users = ranking_users or []
+    if ranking_users is None and LeaderboardRank.objects.filter(range_key=range_key).exists():
+        me_score = (
+            _get_db_user_period_xp(me_user.id, range_key)
+            + _get_pending_user_period_xp(_get_redis(), me_user.id, range_key)
+        )
+        snapshot = (
+            LeaderboardRank.objects.filter(range_key=range_key, user_id=me_user.id)
+            .values_list("rank", "score")
+            .first()
+        )
+        if snapshot and int(snapshot[1]) == me_score:
+            rank = int(snapshot[0])
+        else:
+            rank = (
+                LeaderboardRank.objects.filter(range_key=range_key, score__gt=me_score)
+                .exclude(user_id=me_user.id)
+                .count()
+                + 1
+            )
+        return _serialize_leaderboard_me(me_user, xp_value=me_score, rank=rank)
+
+    if ranking_users is None:
+        ranking_users, score_map = _build_period_ranking(range_key, today, redis=_get_redis())
+    users = ranking_users
     scores = score_map or {}
     me_score = int(scores.get(me_user.id, 0))
     me_rank = None
@@ -1594,6 +2046,238 @@ def _build_live_me_entry(user: User, range_key: str, today: date, ranking_users:
     return _serialize_leaderboard_me(me_user, xp_value=me_score, rank=me_rank)
 
 
+def _build_leaderboard_items(range_key: str, limit: int, today: date, redis=None) -> tuple[list[dict], list[User] | None, dict[int, int] | None]:
+    if LeaderboardRank.objects.filter(range_key=range_key).exists():
+        return _serialize_rank_rows(_snapshot_rank_rows(range_key, 1, limit=limit)), None, None
+    if range_key == "all":
+        ranking_users = list(
+            User.objects.filter(participation_in_ratings=True)
+            .only(*LEADERBOARD_USER_FIELDS)
+            .order_by("-xp", "id")[:limit]
+        )
+        ranking_scores = {u.id: int(u.xp or 0) for u in ranking_users}
+    else:
+        ranking_users, ranking_scores = _build_period_ranking(range_key, today, redis=redis)
+    return _build_items_from_users(ranking_users, ranking_scores, limit), ranking_users, ranking_scores
+
+
+def _iter_leaderboard_ranking(range_key: str, redis=None):
+    if range_key == "all":
+        rows = (
+            User.objects.filter(participation_in_ratings=True)
+            .order_by("-xp", "id")
+            .values_list("id", "xp")
+        )
+        for user_id, xp in rows.iterator(chunk_size=LEADERBOARD_RANK_BATCH_SIZE):
+            yield user_id, int(xp or 0)
+        return
+    users, score_map = _build_period_ranking(range_key, timezone.localdate(), redis=redis)
+    for u in users:
+        yield u.id, int(score_map.get(u.id, 0))
+
+
+def _refresh_leaderboard_ranks(range_key: str, redis=None) -> int:
+    now_dt = timezone.now()
+    # The ranking is built before the write transaction so the swap holds the write lock only briefly.
+    rows = [
+        LeaderboardRank(
+            range_key=range_key,
+            user_id=user_id,
+            rank=rank,
+            score=score,
+            refreshed_at=now_dt,
+        )
+        for rank, (user_id, score) in enumerate(_iter_leaderboard_ranking(range_key, redis), start=1)
+    ]
+    with transaction.atomic():
+        LeaderboardRank.objects.filter(range_key=range_key).delete()
+        LeaderboardRank.objects.bulk_create(rows, batch_size=LEADERBOARD_RANK_BATCH_SIZE)
+    _cache_set_safe(
+        LEADERBOARD_RANK_REFRESHED_KEY.format(range=range_key),
+        now_dt.timestamp(),
+        timeout=LEADERBOARD_RANK_REFRESH_SECONDS * 6,
+    )
+    return len(rows)
+
+
+def _maybe_refresh_leaderboard_ranks(range_keys: tuple[str, ...] = ("all",), *, force: bool = False, redis=None) -> tuple[str, ...]:
+    now_ts = timezone.now().timestamp()
+    refreshed = []
+    for range_key in range_keys:
+        refreshed_at = _cache_get_safe(LEADERBOARD_RANK_REFRESHED_KEY.format(range=range_key))
+        if not force and refreshed_at and now_ts - float(refreshed_at) < LEADERBOARD_RANK_REFRESH_SECONDS:
+            continue
+        _refresh_leaderboard_ranks(range_key, redis=redis)
+        refreshed.append(range_key)
+    return tuple(refreshed)
+
+
+def _refresh_leaderboard_caches(
+    limits: tuple[int, ...] = (LEADERBOARD_DEFAULT_LIMIT,),
+    force_ranges: tuple[str, ...] = (),
+) -> None:
+    today = timezone.localdate()
+    redis = _get_redis()
+    for range_key in ("week", "month", "all"):
+        for limit in limits:
+            _cache_refresh(
+                LEADERBOARD_CACHE_KEY.format(range=range_key, limit=limit),
+                lambda: _build_leaderboard_items(range_key, limit, today, redis)[0],
+                soft_ttl=LEADERBOARD_CACHE_TTL_SECONDS,
+                hard_ttl=LEADERBOARD_CACHE_STALE_TTL_SECONDS,
+                refresh_ahead=LEADERBOARD_CACHE_REFRESH_AHEAD_SECONDS,
+                force=range_key in force_ranges,
+            )
+
+
+def _history_period_bounds(range_key: str, period_start: date) -> tuple[date, date, datetime, datetime]:
+    if range_key == "month":
+        start = period_start.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    else:
+        start = period_start - timedelta(days=period_start.weekday())
+        end = start + timedelta(days=6)
+    tz = timezone.get_current_timezone()
+    start_dt = timezone.make_aware(datetime.combine(start, time.min), tz)
+    end_dt = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz)
+    return start, end, start_dt, end_dt
+
+
+def _last_completed_period_start(range_key: str, today: date | None = None) -> date:
+    today = today or timezone.localdate()
+    if range_key == "month":
+        return (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+    return today - timedelta(days=today.weekday()) - timedelta(days=7)
+
+
+def _interval_scores_queryset(start_dt: datetime, end_dt: datetime):
+    return (
+        XpIntervalTransaction.objects.filter(
+            period_start__gte=start_dt,
+            period_start__lt=end_dt,
+            user__participation_in_ratings=True,
+        )
+        .values("user_id")
+        .annotate(total=Sum("xp"))
+        .filter(total__gt=0)
+    )
+
+
+def _ranked_interval_scores(start_dt: datetime, end_dt: datetime) -> list[tuple[int, int]]:
+    rows = _interval_scores_queryset(start_dt, end_dt).order_by("-total", "user_id").values_list("user_id", "total")
+    return [(int(user_id), int(total)) for user_id, total in rows]
+
+
+def _write_leaderboard_snapshot(
+    range_key: str,
+    start: date,
+    end: date,
+    ranked: list[tuple[int, int]],
+    participants: int | None = None,
+) -> LeaderboardSnapshot:
+    top = ranked[:LEADERBOARD_HISTORY_TOP_K]
+    users = User.objects.only(*LEADERBOARD_USER_FIELDS).in_bulk([user_id for user_id, _ in top])
+    titles = _leaderboard_titles(list(users.values()))
+    items = [
+        _serialize_leaderboard_user(users[user_id], rank=rank, xp_value=score, title=titles.get(user_id))
+        for rank, (user_id, score) in enumerate(top, start=1)
+        if user_id in users
+    ]
+    snapshot, _ = LeaderboardSnapshot.objects.update_or_create(
+        range_key=range_key,
+        period_start=start,
+        defaults={
+            "period_end": end,
+            "participants": len(ranked) if participants is None else participants,
+            "top": items,
+        },
+    )
+    return snapshot
+
+
+def _aggregate_weekly_xp(week_start: date) -> LeaderboardSnapshot:
+    start, end, start_dt, end_dt = _history_period_bounds("week", week_start)
+    qn = connection.ops.quote_name
+    sql = f"""
+        INSERT INTO {qn(XpTransaction._meta.db_table)}
+            ({qn("user_id")}, {qn("week_start")}, {qn("week_end")}, {qn("xp")}, {qn("rank")}, {qn("created_at")})
+        SELECT
+            t.{qn("user_id")}, %s, %s, SUM(t.{qn("xp")}),
+            ROW_NUMBER() OVER (ORDER BY SUM(t.{qn("xp")}) DESC, t.{qn("user_id")}),
+            %s
+        FROM {qn(XpIntervalTransaction._meta.db_table)} t
+        INNER JOIN {qn(User._meta.db_table)} u ON u.{qn("id")} = t.{qn("user_id")}
+        WHERE t.{qn("period_start")} >= %s
+            AND t.{qn("period_start")} < %s
+            AND u.{qn("participation_in_ratings")} = %s
+        GROUP BY t.{qn("user_id")}
+        HAVING SUM(t.{qn("xp")}) > 0
+        ON CONFLICT ({qn("user_id")}, {qn("week_start")}) DO UPDATE SET
+            {qn("week_end")} = excluded.{qn("week_end")},
+            {qn("xp")} = excluded.{qn("xp")},
+            {qn("rank")} = excluded.{qn("rank")}
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [
+                connection.ops.adapt_datefield_value(start),
+                connection.ops.adapt_datefield_value(end),
+                connection.ops.adapt_datetimefield_value(timezone.now()),
+                connection.ops.adapt_datetimefield_value(start_dt),
+                connection.ops.adapt_datetimefield_value(end_dt),
+                True,
+            ])
+        XpTransaction.objects.filter(week_start=start).exclude(
+            user_id__in=_interval_scores_queryset(start_dt, end_dt).values("user_id")
+        ).delete()
+        week_rows = XpTransaction.objects.filter(week_start=start)
+        top = list(week_rows.order_by("rank").values_list("user_id", "xp")[:LEADERBOARD_HISTORY_TOP_K])
+        return _write_leaderboard_snapshot("week", start, end, top, participants=week_rows.count())
+
+
+def _aggregate_monthly_snapshot(month_start: date) -> LeaderboardSnapshot:
+    start, end, start_dt, end_dt = _history_period_bounds("month", month_start)
+    ranked = _ranked_interval_scores(start_dt, end_dt)
+    return _write_leaderboard_snapshot("month", start, end, ranked)
+
+
+def _serialize_history_period(snapshot: LeaderboardSnapshot) -> dict:
+    return {
+        "range": snapshot.range_key,
+        "period_start": snapshot.period_start.isoformat(),
+        "period_end": snapshot.period_end.isoformat(),
+        "participants": snapshot.participants,
+        "winners": list(snapshot.top[:LEADERBOARD_HISTORY_WINNERS]),
+    }
+
+
+def _build_leaderboard_history_payload(user: User, range_key: str, period_start: date | None, limit: int) -> dict:
+    normalized_range = "month" if range_key == "month" else "week"
+    if period_start is None:
+        snapshots = LeaderboardSnapshot.objects.filter(range_key=normalized_range).order_by("-period_start")
+        return {
+            "range": normalized_range,
+            "items": [_serialize_history_period(item) for item in snapshots[:LEADERBOARD_HISTORY_PAGE_SIZE]],
+        }
+
+    start = _history_period_bounds(normalized_range, period_start)[0]
+    snapshot = LeaderboardSnapshot.objects.filter(range_key=normalized_range, period_start=start).first()
+    if not snapshot:
+        return {"range": normalized_range, "period_start": start.isoformat(), "items": [], "me": None}
+
+    normalized_limit = max(1, min(int(limit or LEADERBOARD_DEFAULT_LIMIT), LEADERBOARD_HISTORY_TOP_K))
+    me = next(({"rank": item["rank"], "xp": item["xp"]} for item in snapshot.top if item["id"] == user.id), None)
+    if me is None and normalized_range == "week":
+        row = XpTransaction.objects.filter(user=user, week_start=start).values("rank", "xp").first()
+        if row:
+            me = {"rank": row["rank"], "xp": int(row["xp"] or 0)}
+    return {
+        **_serialize_history_period(snapshot),
+        "items": list(snapshot.top[:normalized_limit]),
+        "me": me,
+    }
+
+
 def _build_leaderboard_payload(user: User, range_key: str = "month", limit: int = LEADERBOARD_DEFAULT_LIMIT) -> dict:
     normalized_range = _normalize_leaderboard_range(range_key)
     normalized_limit = max(1, min(int(limit or LEADERBOARD_DEFAULT_LIMIT), LEADERBOARD_MAX_LIMIT))
@@ -1602,35 +2286,31 @@ def _build_leaderboard_payload(user: User, range_key: str = "month", limit: int
     if redis:
         _maybe_flush_pending_xp(redis)
 
-    use_cache = True
-    cache_key = f"xp:leaderboard:items:v5:{normalized_range}:{normalized_limit}"
-    items = _cache_get_safe(cache_key) if use_cache else None
-    ranking_users: list[User] | None = None
-    ranking_scores: dict[int, int] | None = None
-    if items is None:
-        if normalized_range == "all":
-            ranking_users = list(User.objects.filter(participation_in_ratings=True).order_by("-xp", "id"))
-            ranking_scores = {u.id: int(u.xp or 0) for u in ranking_users}
-            items = _build_items_from_users(ranking_users, ranking_scores, normalized_limit)
-        else:
-            ranking_users, ranking_scores = _build_period_ranking(normalized_range, today, redis=redis)
-            items = _build_items_from_users(ranking_users, ranking_scores, normalized_limit)
-        if use_cache:
-            _cache_set_safe(cache_key, items, timeout=LEADERBOARD_CACHE_TTL_SECONDS)
+    built: dict = {}
 
-    if normalized_range == "all":
-        me = _build_live_me_entry(user, normalized_range, today)
-    else:
-        if ranking_users is None or ranking_scores is None:
-            ranking_users, ranking_scores = _build_period_ranking(normalized_range, today, redis=redis)
-        me = _build_live_me_entry(
-            user,
-            normalized_range,
-            today,
-            ranking_users=ranking_users,
-            score_map=ranking_scores,
-        )
+    def _build_items() -> list[dict]:
+        items, built["users"], built["scores"] = _build_leaderboard_items(normalized_range, normalized_limit, today, redis)
+        return items
+
+    items = _cache_get_or_rebuild(
+        LEADERBOARD_CACHE_KEY.format(range=normalized_range, limit=normalized_limit),
+        _build_items,
+        soft_ttl=LEADERBOARD_CACHE_TTL_SECONDS,
+        hard_ttl=LEADERBOARD_CACHE_STALE_TTL_SECONDS,
+        refresh_ahead=LEADERBOARD_CACHE_REFRESH_AHEAD_SECONDS,
+    )
+    ranking_users: list[User] | None = built.get("users")
+    ranking_scores: dict[int, int] | None = built.get("scores")
+
+    me = _build_live_me_entry(
+        user,
+        normalized_range,
+        today,
+        ranking_users=ranking_users,
+        score_map=ranking_scores,
+    )
 
+    next_cursor = _leaderboard_next_cursor(items, normalized_limit)
     if me:
         patched_items = []
         for item in items:
@@ -1640,7 +2320,240 @@ def _build_leaderboard_payload(user: User, range_key: str = "month", limit: int
                 patched_items.append(item)
         items = patched_items
 
-    return {"range": normalized_range, "items": items, "me": me}
+    return {
+        "range": normalized_range,
+        "items": items,
+        "me": me,
+        "next_cursor": next_cursor,
+    }
+
+
+def _resolve_participant_source(habit: Habit) -> Habit | None:
+    source_habit = habit
+    if habit.source_habit_id:
+        source_habit = Habit.objects.select_related("owner").filter(pk=habit.source_habit_id).first()
+        if not source_habit:
+            return None
+    has_copies = HabitCopy.objects.filter(source_habit=source_habit).exists()
+    if source_habit.visibility != "Публичный" and not has_copies and not habit.source_habit_id:
+        return None
+    return source_habit
+
+
+def _habit_group_completion_scores(source_habit: Habit, range_key: str, today: date) -> dict[int, int]:
+    completions = HabitCompletion.objects.filter(
+        Q(habit_id=source_habit.id) | Q(habit__source_habit_id=source_habit.id),
+        count__gte=F("habit__goal"),
+    )
+    days = HABIT_LEADERBOARD_RANGE_DAYS.get(range_key)
+    if days:
+        completions = completions.filter(date__range=(today - timedelta(days=days - 1), today))
+    return {
+        row["habit__owner_id"]: int(row["total"] or 0)
+        for row in completions.values("habit__owner_id").annotate(total=Count("id"))
+    }
+
+
+def _habit_group_streak_scores(source_habit: Habit, today: date) -> dict[int, int]:
+    today_count = HabitCompletion.objects.filter(habit_id=OuterRef("pk"), date=today).values("count")[:1]
+    habits = (
+        Habit.objects.filter(Q(id=source_habit.id) | Q(source_habit_id=source_habit.id))
+        .only("id", "owner_id", "goal", "streak_current", "streak_last_date")
+        .annotate(today_count=Subquery(today_count))
+    )
+    scores: dict[int, int] = {}
+    for habit in habits:
+        completed_today = int(habit.today_count or 0) >= max(habit.goal, 1)
+        streak = _habit_streak_from_cached_fields(habit, today, completed_today)
+        scores[habit.owner_id] = max(scores.get(habit.owner_id, 0), streak)
+    return scores
+
+
+def _build_habit_group_ranking(source_habit: Habit, metric: str, range_key: str) -> list[list[int]]:
+    today = timezone.localdate()
+    if metric == "streak":
+        scores = _habit_group_streak_scores(source_habit, today)
+    else:
+        scores = _habit_group_completion_scores(source_habit, range_key, today)
+    participant_ids = {source_habit.owner_id}
+    participant_ids.update(HabitCopy.objects.filter(source_habit=source_habit).values_list("user_id", flat=True))
+    ranked = sorted(
+        participant_ids,
+        key=lambda user_id: (-scores.get(user_id, 0), user_id != source_habit.owner_id, user_id),
+    )
+    return [[user_id, int(scores.get(user_id, 0))] for user_id in ranked]
+
+
+def _serialize_habit_group_entry(u: User, rank: int, score: int, author_id: int) -> dict:
+    return {
+        "id": u.id,
+        "name": u.first_name or u.username or f"User {u.id}",
+        "avatar": u.photo_url,
+        "is_premium": _is_premium_active(u),
+        "is_author": u.id == author_id,
+        "rank": rank,
+        "score": score,
+    }
+
+
+def _build_habit_leaderboard_payload(user: User, source_habit: Habit, metric: str, range_key: str, limit: int) -> dict:
+    normalized_metric = metric if metric in HABIT_LEADERBOARD_METRICS else "completions"
+    normalized_range = _normalize_leaderboard_range(range_key) if normalized_metric == "completions" else "all"
+    normalized_limit = max(1, min(int(limit or LEADERBOARD_DEFAULT_LIMIT), LEADERBOARD_MAX_LIMIT))
+    ranking = _cache_get_or_rebuild(
+        HABIT_LEADERBOARD_CACHE_KEY.format(source=source_habit.id, metric=normalized_metric, range=normalized_range),
+        lambda: _build_habit_group_ranking(source_habit, normalized_metric, normalized_range),
+        soft_ttl=HABIT_LEADERBOARD_CACHE_TTL_SECONDS,
+        hard_ttl=HABIT_LEADERBOARD_CACHE_TTL_SECONDS * 10,
+    )
+    top = ranking[:normalized_limit]
+    me_position = next(
+        ((rank, score) for rank, (user_id, score) in enumerate(ranking, start=1) if user_id == user.id),
+        None,
+    )
+    wanted_ids = {user_id for user_id, _ in top}
+    if me_position:
+        wanted_ids.add(user.id)
+    users = User.objects.only("id", "first_name", "username", "photo_url", "premium_expiration").in_bulk(wanted_ids)
+    items = [
+        _serialize_habit_group_entry(users[user_id], rank, score, source_habit.owner_id)
+        for rank, (user_id, score) in enumerate(top, start=1)
+        if user_id in users
+    ]
+    me = None
+    if me_position and user.id in users:
+        me = _serialize_habit_group_entry(users[user.id], me_position[0], me_position[1], source_habit.owner_id)
+    return {
+        "metric": normalized_metric,
+        "range": normalized_range,
+        "total": len(ranking),
+        "items": items,
+        "me": me,
+    }
+
+
+def _leaderboard_next_cursor(items: list[dict], limit: int) -> dict | None:
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    return {"after_rank": int(last["rank"]), "after_score": int(last["xp"])}
+
+
+def _snapshot_rank_rows(
+    range_key: str,
+    start_rank: int,
+    end_rank: int | None = None,
+    limit: int | None = None,
+    after_score: int | None = None,
+) -> list[tuple[User, int, int]]:
+    rows = (
+        LeaderboardRank.objects.filter(range_key=range_key, user__participation_in_ratings=True)
+        .select_related("user")
+        .only("rank", "score", *(f"user__{field}" for field in LEADERBOARD_USER_FIELDS))
+    )
+    if after_score is not None:
+        rows = rows.filter(Q(score__lt=after_score) | Q(score=after_score, rank__gte=start_rank))
+    else:
+        rows = rows.filter(rank__gte=start_rank)
+    if end_rank is not None:
+        rows = rows.filter(rank__lte=end_rank)
+    rows = rows.order_by("rank")
+    if limit is not None:
+        rows = rows[:limit]
+    return [(row.user, int(row.rank), int(row.score)) for row in rows]
+
+
+def _live_rank_rows(
+    range_key: str,
+    ranking: tuple[list[User], dict[int, int]] | None,
+    start_rank: int,
+    end_rank: int | None = None,
+    limit: int | None = None,
+) -> list[tuple[User, int, int]]:
+    offset = max(start_rank - 1, 0)
+    stop = end_rank if end_rank is not None else offset + (limit or LEADERBOARD_DEFAULT_LIMIT)
+    if range_key == "all":
+        users = list(
+            User.objects.filter(participation_in_ratings=True)
+            .only(*LEADERBOARD_USER_FIELDS)
+            .order_by("-xp", "id")[offset:stop]
+        )
+        return [(u, offset + index, int(u.xp or 0)) for index, u in enumerate(users, start=1)]
+    users, score_map = ranking or ([], {})
+    return [
+        (u, offset + index, int(score_map.get(u.id, 0)))
+        for index, u in enumerate(users[offset:stop], start=1)
+    ]
+
+
+def _serialize_rank_rows(rows: list[tuple[User, int, int]]) -> list[dict]:
+    titles = _leaderboard_titles([u for u, _, _ in rows])
+    return [
+        _serialize_leaderboard_user(u, rank=rank, xp_value=score, title=titles.get(u.id))
+        for u, rank, score in rows
+    ]
+
+
+def _build_leaderboard_window(
+    user: User,
+    range_key: str = "month",
+    limit: int = LEADERBOARD_DEFAULT_LIMIT,
+    around_me: bool = False,
+    radius: int = LEADERBOARD_DEFAULT_RADIUS,
+    after_rank: int | None = None,
+    after_score: int | None = None,
+) -> dict:
+    normalized_range = _normalize_leaderboard_range(range_key)
+    normalized_limit = max(1, min(int(limit or LEADERBOARD_DEFAULT_LIMIT), LEADERBOARD_MAX_LIMIT))
+    normalized_radius = max(0, min(int(radius), LEADERBOARD_MAX_RADIUS))
+    today = timezone.localdate()
+    has_snapshot = LeaderboardRank.objects.filter(range_key=normalized_range).exists()
+    ranking = None
+    if not has_snapshot and normalized_range != "all":
+        ranking = _build_period_ranking(normalized_range, today, redis=_get_redis())
+
+    me = None
+    me_user = User.objects.filter(id=user.id).first() or user
+    if me_user.participation_in_ratings:
+        if has_snapshot:
+            position = (
+                LeaderboardRank.objects.filter(range_key=normalized_range, user_id=me_user.id)
+                .values_list("rank", "score")
+                .first()
+            )
+            if position:
+                me = _serialize_leaderboard_me(me_user, xp_value=int(position[1]), rank=int(position[0]))
+        else:
+            me = _build_live_me_entry(
+                me_user,
+                normalized_range,
+                today,
+                ranking_users=ranking[0] if ranking else None,
+                score_map=ranking[1] if ranking else None,
+            )
+
+    if around_me and me and me.get("rank"):
+        start_rank = max(1, int(me["rank"]) - normalized_radius)
+        end_rank = int(me["rank"]) + normalized_radius
+        page_limit = None
+        after_score = None
+    else:
+        start_rank = max(int(after_rank or 0), 0) + 1
+        end_rank = None
+        page_limit = normalized_limit
+
+    if has_snapshot:
+        rows = _snapshot_rank_rows(normalized_range, start_rank, end_rank, page_limit, after_score)
+    else:
+        rows = _live_rank_rows(normalized_range, ranking, start_rank, end_rank, page_limit)
+
+    items = _serialize_rank_rows(rows)
+    return {
+        "range": normalized_range,
+        "items": items,
+        "me": me,
+        "next_cursor": _leaderboard_next_cursor(items, page_limit) if page_limit else None,
+    }
 
 
 @api_view(["GET"])
@@ -1680,8 +2593,8 @@ def app_bootstrap(request):
         .prefetch_related("completions")
         .order_by("-created_at")
     )
-    categories = Category.objects.all().order_by("id")
-    products = Product.objects.filter(is_active=True).order_by("created_at")
+    categories = get_categories()
+    products = get_active_products()
 
     payload = {
         "user": _serialize_user_with_live_xp(user),
@@ -1709,6 +2622,7 @@ class ProductViewSet(viewsets.ModelViewSet):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@idempotent("robokassa-create-payment")
 def create_robokassa_payment(request):
     product_id = request.data.get("product_id")
     if not product_id:
@@ -1806,6 +2720,7 @@ def create_robokassa_payment(request):
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@idempotent("robokassa-send-payment-message")
 def send_robokassa_payment_message(request):
     product_id = request.data.get("product_id")
     if not product_id:
@@ -2235,21 +3150,9 @@ class HabitViewSet(viewsets.ModelViewSet):
                 target_date = date.fromisoformat(date_param)
             except ValueError:
                 return Response({"detail": "Invalid date format"}, status=status.HTTP_400_BAD_REQUEST)
-            weekdays = [
-                "Понедельник",
-                "Вторник",
-                "Среда",
-                "Четверг",
-                "Пятница",
-                "Суббота",
-                "Воскресенье",
-            ]
-            weekday_name = weekdays[target_date.weekday()]
-            queryset = [
-                habit
-                for habit in queryset
-                if not habit.repeat_days or weekday_name in habit.repeat_days
-            ]
+            queryset = queryset.annotate(
+                day_bit=F("repeat_mask").bitand(weekday_bit(target_date))
+            ).filter(day_bit__gt=0)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
@@ -2294,6 +3197,7 @@ class HabitViewSet(viewsets.ModelViewSet):
                 Habit.objects.filter(pk=source_id, copied_count__gt=0).update(copied_count=F("copied_count") - 1)
 
     @action(detail=True, methods=["post"], url_path="complete")
+    @idempotent("habit-complete")
     def complete(self, request, pk=None):
         habit = self.get_object()
         date_value = request.data.get("date")
@@ -2311,61 +3215,45 @@ class HabitViewSet(viewsets.ModelViewSet):
             completion_date = timezone.localdate()
 
         today = timezone.localdate()
-        if completion_date > today:
-            return Response({"detail": "Cannot complete habit for a future date"}, status=status.HTTP_400_BAD_REQUEST)
-        if habit.is_archived:
-            return Response({"detail": "Habit is archived"}, status=status.HTTP_400_BAD_REQUEST)
-        if habit.end_date and completion_date > habit.end_date:
-            return Response({"detail": "Habit is no longer active"}, status=status.HTTP_400_BAD_REQUEST)
-
-        if habit.repeat_days:
-            weekdays = [
-                "Понедельник",
-                "Вторник",
-                "Среда",
-                "Четверг",
-                "Пятница",
-                "Суббота",
-                "Воскресенье",
-            ]
-            weekday_name = weekdays[completion_date.weekday()]
-            if weekday_name not in habit.repeat_days:
-                return Response({"detail": "Habit is not scheduled for this day"}, status=status.HTTP_400_BAD_REQUEST)
+        error = _habit_completion_error(habit, completion_date, today)
+        if error:
+            return Response({"detail": error}, status=status.HTTP_400_BAD_REQUEST)
 
         with transaction.atomic():
-            completion, _created = HabitCompletion.objects.select_for_update().get_or_create(
-                habit=habit, date=completion_date
-            )
-            goal = max(habit.goal, 1)
-            prev_count = completion.count
-            new_count = min(goal, completion.count + increment)
-            completion.count = new_count
-            completion.save()
+            prev_count, new_count, goal, newly_completed = _apply_habit_completion(habit, completion_date, increment)
         added_count = max(new_count - prev_count, 0)
 
+        user = request.user
         if added_count > 0:
-            streak_days = _calculate_streak_days(request.user, completion_date)
-            multiplier = _get_streak_multiplier(streak_days)
-            completed_before = prev_count >= goal
-            completed_now = new_count >= goal
-            completed_increment = 1 if (not completed_before and completed_now) else 0
-            raw_xp = int(round(completed_increment * XP_BASE * multiplier))
-            habits_today = (
-                HabitCompletion.objects.filter(
-                    habit__owner=request.user, date=completion_date, count__gte=F("habit__goal")
-                )
-                .values("habit_id")
-                .distinct()
-                .count()
-            )
+            completed_increment = 1 if newly_completed else 0
             with transaction.atomic():
                 user = User.objects.select_for_update().get(pk=request.user.pk)
-                awarded_xp = _award_xp(user, raw_xp, completion_date, habits_today)
+                awarded_xp = _award_completion_xp(user, completion_date, completed_increment)
                 _check_and_award_quests(user, completion_date)
 
         if completion_date < today and habit.stats_rollup_date and completion_date <= habit.stats_rollup_date:
             _rebuild_habit_stats(habit, today)
 
+        if _wants_minimal_response(request):
+            completed = new_count >= goal
+            if completion_date == today:
+                streak = _habit_streak_from_cached_fields(habit, today, completed)
+            else:
+                streak = int(habit.streak_current or 0)
+            response = Response({
+                "id": habit.id,
+                "date": completion_date.isoformat(),
+                "count": new_count,
+                "goal": goal,
+                "completed": completed,
+                "streak": streak,
+                "xp_awarded": int(awarded_xp),
+                "user_progress": _minimal_user_progress(user, awarded_xp),
+            })
+            if "Prefer" in request.headers:
+                response["Preference-Applied"] = "return=minimal"
+            return response
+
         habit.refresh_from_db()
         habit = Habit.objects.select_related("category").prefetch_related("completions").get(pk=habit.pk)
         serializer = self.get_serializer(habit, context={**self.get_serializer_context(), "date": completion_date})
@@ -2381,6 +3269,249 @@ class HabitViewSet(viewsets.ModelViewSet):
             }
         })
 
+    @action(detail=False, methods=["post"], url_path="complete-batch")
+    @idempotent("habit-complete-batch")
+    def complete_batch(self, request):
+        raw_items = _request_list(request, "items")
+        if not isinstance(raw_items, list) or not raw_items:
+            return Response({"detail": "items must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(raw_items) > HABIT_COMPLETE_BATCH_MAX_ITEMS:
+            return Response(
+                {"detail": f"items must contain at most {HABIT_COMPLETE_BATCH_MAX_ITEMS} entries"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        today = timezone.localdate()
+        entries = []
+        for raw in raw_items:
+            try:
+                habit_id = int(raw.get("habit_id"))
+                count = int(raw.get("count", 1))
+                completion_date = date.fromisoformat(raw["date"]) if raw.get("date") else today
+            except (AttributeError, TypeError, ValueError):
+                return Response({"detail": "Invalid batch item"}, status=status.HTTP_400_BAD_REQUEST)
+            if count < 1:
+                return Response({"detail": "count must be >= 1"}, status=status.HTTP_400_BAD_REQUEST)
+            entries.append((habit_id, completion_date, count))
+
+        _archive_expired_habits(request.user, today)
+        _rollup_user_habit_stats(request.user, today)
+        habits = Habit.objects.filter(owner=request.user).in_bulk({habit_id for habit_id, _, _ in entries})
+
+        results = []
+        newly_completed_by_date: dict[date, int] = {}
+        rebuild_ids: set[int] = set()
+        with transaction.atomic():
+            for habit_id, completion_date, count in sorted(entries, key=lambda entry: (entry[0], entry[1])):
+                habit = habits.get(habit_id)
+                error = "Habit not found" if not habit else _habit_completion_error(habit, completion_date, today)
+                if error:
+                    results.append({"habit_id": habit_id, "date": completion_date.isoformat(), "detail": error})
+                    continue
+                prev_count, new_count, goal, newly_completed = _apply_habit_completion(habit, completion_date, count)
+                if newly_completed:
+                    newly_completed_by_date[completion_date] = newly_completed_by_date.get(completion_date, 0) + 1
+                if (
+                    new_count != prev_count
+                    and completion_date < today
+                    and habit.stats_rollup_date
+                    and completion_date <= habit.stats_rollup_date
+                ):
+                    rebuild_ids.add(habit.id)
+                results.append({
+                    "habit_id": habit_id,
+                    "date": completion_date.isoformat(),
+                    "count": new_count,
+                    "goal": goal,
+                    "completed": new_count >= goal,
+                })
+
+        awarded_xp = 0
+        if newly_completed_by_date:
+            with transaction.atomic():
+                user = User.objects.select_for_update().get(pk=request.user.pk)
+                for completion_date in sorted(newly_completed_by_date):
+                    awarded_xp += _award_completion_xp(user, completion_date, newly_completed_by_date[completion_date])
+                _check_and_award_quests(user, max(newly_completed_by_date))
+
+        for habit_id in rebuild_ids:
+            _rebuild_habit_stats(habits[habit_id], today)
+
+        if _wants_minimal_response(request):
+            progress_user = user if newly_completed_by_date else request.user
+            return Response({
+                "results": results,
+                "xp_awarded": int(awarded_xp),
+                "user_progress": _minimal_user_progress(progress_user, awarded_xp),
+            })
+
+        response_user = User.objects.select_related("current_title").get(pk=request.user.pk)
+        title = _resolve_title(response_user)
+        return Response({
+            "results": results,
+            "xp_awarded": int(awarded_xp),
+            "user_progress": {
+                "xp": _get_user_live_xp(response_user),
+                "level": int(response_user.level or 1),
+                "title": title.name if title else "",
+            },
+        })
+
+    @action(detail=False, methods=["post"], url_path="sync")
+    def sync(self, request):
+        raw_events = _request_list(request, "events")
+        if not isinstance(raw_events, list):
+            return Response({"detail": "events must be a list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(raw_events) > HABIT_SYNC_MAX_EVENTS:
+            return Response(
+                {"detail": f"events must contain at most {HABIT_SYNC_MAX_EVENTS} entries"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        today = timezone.localdate()
+        events = []
+        rejected = []
+        duplicates: list[str] = []
+        seen_ids: set[str] = set()
+        for raw in raw_events:
+            event_id = str(raw.get("event_id") or "").strip() if isinstance(raw, dict) else ""
+            try:
+                habit_id = int(raw.get("habit_id"))
+                event_date = date.fromisoformat(raw.get("date"))
+                delta = int(raw.get("delta"))
+            except (AttributeError, TypeError, ValueError):
+                rejected.append({"event_id": event_id, "detail": "Invalid event"})
+                continue
+            client_ts = _parse_client_ts(raw.get("client_ts"))
+            if not event_id or len(event_id) > 64 or client_ts is None or delta == 0:
+                rejected.append({"event_id": event_id, "detail": "Invalid event"})
+                continue
+            if event_id in seen_ids:
+                duplicates.append(event_id)
+                continue
+            seen_ids.add(event_id)
+            events.append((event_id, habit_id, event_date, delta, client_ts))
+
+        _archive_expired_habits(request.user, today)
+        _rollup_user_habit_stats(request.user, today)
+        habits = Habit.objects.filter(owner=request.user).in_bulk({event[1] for event in events})
+
+        applied: list[str] = []
+        days: dict[tuple[int, date], dict] = {}
+        newly_completed_by_date: dict[date, int] = {}
+        with transaction.atomic():
+            user = User.objects.select_for_update().get(pk=request.user.pk)
+            known_ids = set(
+                HabitCompletionEvent.objects.filter(user=user, event_id__in=[event[0] for event in events])
+                .values_list("event_id", flat=True)
+            )
+            pending = []
+            for event in events:
+                event_id, habit_id, event_date, delta, client_ts = event
+                if event_id in known_ids:
+                    duplicates.append(event_id)
+                    continue
+                habit = habits.get(habit_id)
+                error = "Habit not found" if not habit else _habit_completion_error(habit, event_date, today)
+                if error:
+                    rejected.append({"event_id": event_id, "detail": error})
+                    continue
+                pending.append(event)
+
+            slots = {(event[1], event[2]) for event in pending}
+            completions = {
+                (completion.habit_id, completion.date): completion
+                for completion in HabitCompletion.objects.select_for_update().filter(
+                    habit_id__in={habit_id for habit_id, _ in slots},
+                    date__in={event_date for _, event_date in slots},
+                )
+                if (completion.habit_id, completion.date) in slots
+            }
+            missing = [
+                HabitCompletion(habit_id=habit_id, date=event_date, count=0)
+                for habit_id, event_date in slots
+                if (habit_id, event_date) not in completions
+            ]
+            if missing:
+                HabitCompletion.objects.bulk_create(missing, ignore_conflicts=True)
+                for completion in HabitCompletion.objects.select_for_update().filter(
+                    habit_id__in={item.habit_id for item in missing},
+                    date__in={item.date for item in missing},
+                ):
+                    completions.setdefault((completion.habit_id, completion.date), completion)
+
+            initial_counts = {slot: int(completions[slot].count or 0) for slot in slots}
+            for event_id, habit_id, event_date, delta, _client_ts in sorted(pending, key=lambda item: (item[4], item[0])):
+                completion = completions[(habit_id, event_date)]
+                goal = max(habits[habit_id].goal, 1)
+                completion.count = max(0, min(goal, int(completion.count or 0) + delta))
+                applied.append(event_id)
+
+            newly_completed_slots = set()
+            for slot in slots:
+                completion = completions[slot]
+                if completion.count >= max(habits[slot[0]].goal, 1) and not completion.xp_awarded:
+                    completion.xp_awarded = True
+                    newly_completed_slots.add(slot)
+            changed = [
+                completions[slot]
+                for slot in slots
+                if completions[slot].count != initial_counts[slot] or slot in newly_completed_slots
+            ]
+            if changed:
+                HabitCompletion.objects.bulk_update(changed, ["count", "xp_awarded"])
+            HabitCompletionEvent.objects.bulk_create([
+                HabitCompletionEvent(
+                    user=user,
+                    habit_id=habit_id,
+                    event_id=event_id,
+                    date=event_date,
+                    delta=delta,
+                    client_ts=client_ts,
+                )
+                for event_id, habit_id, event_date, delta, client_ts in pending
+            ])
+
+            for habit_id, event_date in slots:
+                goal = max(habits[habit_id].goal, 1)
+                final_count = int(completions[(habit_id, event_date)].count or 0)
+                if (habit_id, event_date) in newly_completed_slots:
+                    newly_completed_by_date[event_date] = newly_completed_by_date.get(event_date, 0) + 1
+                days[(habit_id, event_date)] = {
+                    "habit_id": habit_id,
+                    "date": event_date.isoformat(),
+                    "count": final_count,
+                    "goal": goal,
+                    "completed": final_count >= goal,
+                }
+
+        awarded_xp = 0
+        if newly_completed_by_date:
+            with transaction.atomic():
+                user = User.objects.select_for_update().get(pk=request.user.pk)
+                for completion_date in sorted(newly_completed_by_date):
+                    awarded_xp += _award_completion_xp(user, completion_date, newly_completed_by_date[completion_date])
+                _check_and_award_quests(user, max(newly_completed_by_date))
+
+        rebuild_ids = {
+            habit_id
+            for habit_id, event_date in days
+            if event_date < today
+            and habits[habit_id].stats_rollup_date
+            and event_date <= habits[habit_id].stats_rollup_date
+        }
+        for habit_id in rebuild_ids:
+            _rebuild_habit_stats(habits[habit_id], today)
+
+        return Response({
+            "applied": applied,
+            "duplicates": duplicates,
+            "rejected": rejected,
+            "days": sorted(days.values(), key=lambda item: (item["date"], item["habit_id"])),
+            "xp_awarded": int(awarded_xp),
+            "user_progress": _minimal_user_progress(user, awarded_xp),
+        })
+
     @action(detail=True, methods=["post"], url_path="share")
     def share(self, request, pk=None):
         habit = self.get_object()
@@ -2545,15 +3676,8 @@ class HabitViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["get"], url_path="participants")
     def participants(self, request, pk=None):
         habit = self.get_object()
-        source_habit = habit
-        if habit.source_habit_id:
-            try:
-                source_habit = Habit.objects.select_related("owner").get(pk=habit.source_habit_id)
-            except Habit.DoesNotExist:
-                return Response({"total": 0, "items": []})
-
-        has_copies = HabitCopy.objects.filter(source_habit=source_habit).exists()
-        if source_habit.visibility != "Публичный" and not has_copies and not habit.source_habit_id:
+        source_habit = _resolve_participant_source(habit)
+        if not source_habit:
             return Response({"total": 0, "items": []})
 
         owner = source_habit.owner
@@ -2585,6 +3709,24 @@ class HabitViewSet(viewsets.ModelViewSet):
             "items": items,
         })
 
+    @action(detail=True, methods=["get"], url_path="leaderboard")
+    def leaderboard(self, request, pk=None):
+        habit = self.get_object()
+        source_habit = _resolve_participant_source(habit)
+        if not source_habit:
+            return Response({"total": 0, "items": [], "me": None})
+        try:
+            limit = int(request.query_params.get("limit", LEADERBOARD_DEFAULT_LIMIT))
+        except (TypeError, ValueError):
+            limit = LEADERBOARD_DEFAULT_LIMIT
+        return Response(_build_habit_leaderboard_payload(
+            request.user,
+            source_habit,
+            metric=request.query_params.get("metric", "completions"),
+            range_key=request.query_params.get("range", "month"),
+            limit=limit,
+        ))
+
     @action(detail=True, methods=["get"], url_path="participant-stats")
     def participant_stats(self, request, pk=None):
         habit = self.get_object()
@@ -2767,11 +3909,11 @@ class XpViewSet(viewsets.ModelViewSet):
         user = request.user
         _check_and_award_quests(user, timezone.localdate())
         today = timezone.localdate()
-        quests = list(Quest.objects.filter(is_active=True).order_by("group", "order"))
+        quests = list(get_active_quests())
         progress_map = _build_quests_progress_map(user, quests, today)
         completed_map = {
             uq.quest_id: uq
-            for uq in UserQuest.objects.filter(user=user, quest__in=quests)
+            for uq in UserQuest.objects.filter(user=user, quest_id__in=[quest.id for quest in quests])
         }
         items = []
         for quest in quests:
@@ -2811,4 +3953,44 @@ class XpViewSet(viewsets.ModelViewSet):
             limit = int(request.query_params.get("limit", LEADERBOARD_DEFAULT_LIMIT))
         except (TypeError, ValueError):
             limit = LEADERBOARD_DEFAULT_LIMIT
+        around_me = request.query_params.get("around") == "me"
+        try:
+            radius = int(request.query_params.get("radius", LEADERBOARD_DEFAULT_RADIUS))
+        except (TypeError, ValueError):
+            radius = LEADERBOARD_DEFAULT_RADIUS
+        try:
+            after_rank = int(request.query_params["after_rank"]) if "after_rank" in request.query_params else None
+            after_score = int(request.query_params["after_score"]) if "after_score" in request.query_params else None
+        except (TypeError, ValueError):
+            return Response({"detail": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+        if around_me or after_rank is not None:
+            return Response(_build_leaderboard_window(
+                user,
+                range_key=range_key,
+                limit=limit,
+                around_me=around_me,
+                radius=radius,
+                after_rank=after_rank,
+                after_score=after_score,
+            ))
         return Response(_build_leaderboard_payload(user, range_key=range_key, limit=limit))
+
+    @action(detail=False, methods=["get"], url_path="leaderboard/history")
+    def leaderboard_history(self, request):
+        period_start = None
+        raw_period = request.query_params.get("period_start")
+        if raw_period:
+            try:
+                period_start = date.fromisoformat(raw_period)
+            except ValueError:
+                return Response({"detail": "Invalid date format"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get("limit", LEADERBOARD_DEFAULT_LIMIT))
+        except (TypeError, ValueError):
+            limit = LEADERBOARD_DEFAULT_LIMIT
+        return Response(_build_leaderboard_history_payload(
+            request.user,
+            range_key=request.query_params.get("range", "week"),
+            period_start=period_start,
+            limit=limit,
+        ))
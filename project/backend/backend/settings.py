@@ -62,7 +62,7 @@ CORS_ALLOW_METHODS = (
 CORS_ALLOW_HEADERS = (
     'content-disposition', 'accept-encoding',
     'content-type', 'accept', 'origin', 'Authorization',
-    'access-control-allow-methods', 'initData'
+    'access-control-allow-methods', 'initData', 'prefer', 'idempotency-key',
 )
 
 
@@ -12,9 +12,10 @@ from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
 
-from telegram_bot.config import BOT_TOKEN
+from telegram_bot.config import BOT_TOKEN, REMINDERS_IN_BOT
 from telegram_bot.handlers.user import user_router
 from telegram_bot.handlers.admin import admin_router
+from telegram_bot.middlewares import TelegramRateLimitMiddleware
 from telegram_bot.reminders import run_reminder_loop
 
 logging.basicConfig(
@@ -31,23 +32,25 @@ async def main():
         token=BOT_TOKEN,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
+    bot.session.middleware(TelegramRateLimitMiddleware())
 
     dp = Dispatcher(storage=MemoryStorage())
 
     dp.include_router(admin_router)
     dp.include_router(user_router)
 
-    reminder_task = asyncio.create_task(run_reminder_loop(bot))
+    reminder_task = asyncio.create_task(run_reminder_loop(bot)) if REMINDERS_IN_BOT else None
     logger.info("✅ Bot started successfully!")
 
     try:
         await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     finally:
-        reminder_task.cancel()
-        try:
-            await reminder_task
-        except asyncio.CancelledError:
-            pass
+        if reminder_task is not None:
+            reminder_task.cancel()
+            try:
+                await reminder_task
+            except asyncio.CancelledError:
+                pass
         await bot.session.close()
 
 
@@ -12,6 +12,12 @@ BOT_TOKEN = os.getenv('BOT_TOKEN', '')
 WEBAPP_URL = os.getenv('WEBAPP_URL', 'https://aniultra.uz')
 BOT_USERNAME = os.getenv('BOT_USERNAME', 'Routr_bot')
 
+REMINDER_DIGEST_MAX_HABITS = max(int(os.getenv('REMINDER_DIGEST_MAX_HABITS', '10')), 1)
+REMINDERS_IN_BOT = os.getenv('REMINDERS_IN_BOT', '1') != '0'
+REMINDER_SHARD_COUNT = max(int(os.getenv('REMINDER_SHARD_COUNT', '8')), 1)
+STREAK_ALERT_TIME = os.getenv('STREAK_ALERT_TIME', '20:00')
+REMINDER_MAX_LATENESS_MINUTES = max(int(os.getenv('REMINDER_MAX_LATENESS_MINUTES', '15')), 0)
+
 ADMIN_IDS = list(map(int, os.getenv('ADMIN_IDS', '').split(','))) if os.getenv('ADMIN_IDS') else []
 
 DJANGO_SETTINGS_MODULE = 'backend.settings'
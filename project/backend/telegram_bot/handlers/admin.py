@@ -1,6 +1,5 @@
 
 import logging
-import asyncio
 from datetime import timedelta
 from django.utils import timezone
 from aiogram import Router, F
@@ -172,7 +171,6 @@ async def admin_broadcast_confirm(callback: CallbackQuery, state: FSMContext):
                 message_id=message_id
             )
             sent_count += 1
-            await asyncio.sleep(0.05)
         except Exception as e:
             logger.error(f"Error sending broadcast to {user.telegram_id}: {e}")
             error_count += 1
@@ -0,0 +1,18 @@
+from asgiref.sync import sync_to_async
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+from api.telegram_rate import pause, wait_for_slot_async
+
+
+class TelegramRateLimitMiddleware(BaseRequestMiddleware):
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+        await wait_for_slot_async(chat_id)
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter as exc:
+            await sync_to_async(pause, thread_sensitive=False)(float(getattr(exc, "retry_after", 1)))
+            raise
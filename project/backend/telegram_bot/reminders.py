@@ -1,90 +1,83 @@
 import asyncio
 import logging
 import time
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
 
 from asgiref.sync import sync_to_async
 from aiogram.exceptions import TelegramRetryAfter
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from django.core.cache import cache
+from django.db.models.functions import Mod
 from django.utils import timezone
 from django_redis import get_redis_connection
 
-from api.models import Habit, HabitCompletion
-from telegram_bot.config import WEBAPP_URL
+from api.reminder_index import (
+    due_reminders_queryset,
+    ensure_index,
+    get_due_habit_ids,
+    minute_of_day,
+    normalize_hhmm,
+    streak_risk_habits_queryset,
+)
+from telegram_bot.config import (
+    REMINDER_DIGEST_MAX_HABITS,
+    REMINDER_MAX_LATENESS_MINUTES,
+    REMINDER_SHARD_COUNT,
+    STREAK_ALERT_TIME,
+    WEBAPP_URL,
+)
 
 logger = logging.getLogger(__name__)
 
-WEEKDAY_NAMES_RU = [
-    "Понедельник",
-    "Вторник",
-    "Среда",
-    "Четверг",
-    "Пятница",
-    "Суббота",
-    "Воскресенье",
-]
-
-INDEX_VERSION_KEY = "tg:reminder:index:version"
-INDEX_REBUILD_TS_KEY = "tg:reminder:index:rebuilt_at"
-INDEX_LOCK_KEY = "tg:reminder:index:rebuild_lock"
-INDEX_KEY_PREFIX = "tg:reminder:index"
-INDEX_REBUILD_INTERVAL_SECONDS = 300
-INDEX_VERSION_TTL_SECONDS = 7200
 SEND_CONCURRENCY = 30
 GATHER_CHUNK_SIZE = 500
-
-
-def _is_due_time(reminder_times, now_hhmm: str) -> bool:
-    if not isinstance(reminder_times, list):
-        return False
-    for value in reminder_times:
-        if isinstance(value, str) and value[:5] == now_hhmm:
-            return True
-    return False
-
-
-def _normalize_hhmm(value) -> str | None:
-    if not isinstance(value, str):
-        return None
-    value = value.strip()
-    if len(value) < 5:
-        return None
-    candidate = value[:5]
-    if len(candidate) != 5 or candidate[2] != ":":
-        return None
-    hh = candidate[:2]
-    mm = candidate[3:5]
-    if not (hh.isdigit() and mm.isdigit()):
-        return None
-    hhi = int(hh)
-    mmi = int(mm)
-    if hhi < 0 or hhi > 23 or mmi < 0 or mmi > 59:
-        return None
-    return f"{hhi:02d}:{mmi:02d}"
-
-
-def _collect_unique_hhmm(reminder_times) -> set[str]:
-    if not isinstance(reminder_times, list):
-        return set()
-    result: set[str] = set()
-    for value in reminder_times:
-        parsed = _normalize_hhmm(value)
-        if parsed:
-            result.add(parsed)
-    return result
-
-
-def _is_scheduled_for_today(repeat_days, today_weekday_ru: str) -> bool:
-    if not isinstance(repeat_days, list) or not repeat_days:
-        return True
-    return today_weekday_ru in repeat_days
+WORKERS_KEY = "tg:reminder:workers"
+LEADER_KEY = "tg:reminder:leader"
+SHARD_CLAIM_KEY = "tg:reminder:claim:{minute}:{shard}"
+WORKER_LEASE_SECONDS = 15
+SHARD_CLAIM_TTL_SECONDS = 45
+SHARD_CLAIM_RENEW_SECONDS = 15
+SHARD_DONE_TTL_SECONDS = 60 * 60
+SHARD_DONE = "done"
+LAST_PROCESSED_KEY = "tg:reminder:last_processed_minute"
+LAST_PROCESSED_TTL_SECONDS = 60 * 60 * 24
+LAG_KEY = "tg:reminder:lag_seconds"
+LAG_TTL_SECONDS = 60 * 10
+
+STREAK_ALERT_HHMM = normalize_hhmm(STREAK_ALERT_TIME) or "20:00"
+
+_MARK_PROCESSED_LUA = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tonumber(ARGV[1]) > current then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+end
+return 1
+"""
+
+_RENEW_CLAIM_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_FINISH_CLAIM_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
 
 
 def _dedupe_key(habit_id: int, now_hhmm: str, today_iso: str) -> str:
     return f"tg:reminder:habit:{habit_id}:{today_iso}:{now_hhmm}"
 
 
+def _streak_alert_key(user_id: int, today_iso: str) -> str:
+    return f"tg:streak_alert:{user_id}:{today_iso}"
+
+
 def _seconds_to_day_end() -> int:
     now = timezone.now()
     tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
@@ -99,260 +92,368 @@ def _build_reminder_keyboard() -> InlineKeyboardMarkup:
     )
 
 
-def _build_reminder_text(habit) -> str:
+def _habit_line(habit) -> str:
     icon = (habit.icon or "").strip()
     prefix = f"{icon} " if icon else ""
+    return f"{prefix}{habit.title}"
+
+
+def _build_reminder_text(habit) -> str:
     return (
         "Пора отметить привычку\n"
-        f"{prefix}{habit.title}\n\n"
+        f"{_habit_line(habit)}\n\n"
         "Откройте Routr и зафиксируйте выполнение."
     )
 
 
-def _get_redis():
-    try:
-        return get_redis_connection("default")
-    except Exception:
-        return None
-
+def _build_digest_text(habits) -> str:
+    if len(habits) == 1:
+        return _build_reminder_text(habits[0])
+    lines = [_habit_line(habit) for habit in habits[:REMINDER_DIGEST_MAX_HABITS]]
+    hidden = len(habits) - len(lines)
+    if hidden > 0:
+        lines.append(f"…и ещё {hidden}")
+    return (
+        "Пора отметить привычки\n"
+        + "\n".join(lines)
+        + "\n\nОткройте Routr и зафиксируйте выполнение."
+    )
 
-def _acquire_rebuild_lock(redis) -> bool:
-    return bool(redis.set(INDEX_LOCK_KEY, "1", nx=True, ex=180))
 
+def _build_streak_alert_text(habits) -> str:
+    lines = [_habit_line(habit) for habit in habits[:REMINDER_DIGEST_MAX_HABITS]]
+    hidden = len(habits) - len(lines)
+    if hidden > 0:
+        lines.append(f"…и ещё {hidden}")
+    return (
+        "🔥 Серия под угрозой\n"
+        "Сегодня ещё не отмечены:\n"
+        + "\n".join(lines)
+        + "\n\nОтметьте выполнение до конца дня, чтобы не потерять серию."
+    )
 
-def _rebuild_index_sync() -> bool:
-    redis = _get_redis()
-    if redis is None:
-        return False
-    if not _acquire_rebuild_lock(redis):
-        return False
 
-    version = str(int(time.time()))
-    pipe = redis.pipeline(transaction=False)
-    op_count = 0
-
-    queryset = Habit.objects.filter(
-        reminder=True,
-        owner__is_active=True,
-        owner__notification_habit=True,
-        owner__telegram_id__isnull=False,
-    ).only("id", "reminder_times")
-
-    for habit in queryset.iterator(chunk_size=3000):
-        for hhmm in _collect_unique_hhmm(habit.reminder_times):
-            pipe.sadd(f"{INDEX_KEY_PREFIX}:{version}:m:{hhmm}", int(habit.id))
-            op_count += 1
-            if op_count >= 10000:
-                pipe.execute()
-                op_count = 0
-
-    for i in range(24):
-        for j in range(60):
-            pipe.expire(f"{INDEX_KEY_PREFIX}:{version}:m:{i:02d}:{j:02d}", INDEX_VERSION_TTL_SECONDS)
-    pipe.set(INDEX_VERSION_KEY, version, ex=INDEX_VERSION_TTL_SECONDS)
-    pipe.set(INDEX_REBUILD_TS_KEY, str(int(time.time())), ex=INDEX_VERSION_TTL_SECONDS)
-    pipe.execute()
-    return True
-
-
-def _ensure_index_sync(force: bool = False) -> None:
-    redis = _get_redis()
-    if redis is None:
-        return
-    if force:
-        _rebuild_index_sync()
-        return
-
-    last = redis.get(INDEX_REBUILD_TS_KEY)
-    now_ts = int(time.time())
-    if not last:
-        _rebuild_index_sync()
-        return
+async def _ensure_index(force: bool = False) -> None:
+    await sync_to_async(ensure_index, thread_sensitive=False)(force)
 
-    try:
-        last_ts = int(last)
-    except Exception:
-        _rebuild_index_sync()
-        return
 
-    if now_ts - last_ts >= INDEX_REBUILD_INTERVAL_SECONDS:
-        _rebuild_index_sync()
+async def _get_due_habit_ids_from_index(now_hhmm: str) -> list[int] | None:
+    return await sync_to_async(get_due_habit_ids, thread_sensitive=False)(now_hhmm)
 
 
-def _get_due_habit_ids_from_index_sync(now_hhmm: str) -> list[int]:
-    redis = _get_redis()
-    if redis is None:
-        return []
+async def _fetch_due_habits(minute: int, day, habit_ids: list[int] | None, shard: tuple[int, int] | None = None):
+    queryset = due_reminders_queryset(minute, day)
+    if habit_ids is not None:
+        queryset = queryset.filter(habit_id__in=habit_ids)
+    if shard is not None:
+        # Sharding by owner keeps every habit of a chat in the same digest.
+        index, count = shard
+        queryset = queryset.annotate(owner_shard=Mod("habit__owner_id", count)).filter(owner_shard=index)
+    queryset = queryset.select_related("habit__owner").only(
+        "id",
+        "habit__id",
+        "habit__title",
+        "habit__icon",
+        "habit__owner_id",
+        "habit__owner__telegram_id",
+    )
+    return await sync_to_async(lambda: [slot.habit for slot in queryset.iterator(chunk_size=2000)])()
 
-    version = redis.get(INDEX_VERSION_KEY)
-    if not version:
-        return []
-    if isinstance(version, bytes):
-        version = version.decode("utf-8")
 
-    raw_ids = redis.smembers(f"{INDEX_KEY_PREFIX}:{version}:m:{now_hhmm}") or []
-    if not raw_ids:
-        return []
+async def process_due_reminders(bot, shard: tuple[int, int] | None = None, slot=None) -> int:
+    now = timezone.localtime(slot) if slot is not None else timezone.localtime()
+    now_hhmm = now.strftime("%H:%M")
+    today_iso = now.date().isoformat()
+    ttl = _seconds_to_day_end()
 
-    result: list[int] = []
-    for raw in raw_ids:
-        try:
-            result.append(int(raw))
-        except Exception:
-            continue
-    return result
+    # The index only narrows the slot; without it the indexed table lookup is used directly.
+    habit_ids = await _get_due_habit_ids_from_index(now_hhmm)
+    if habit_ids == []:
+        return 0
+    due_habits = await _fetch_due_habits(minute_of_day(now_hhmm), now.date(), habit_ids, shard)
+    if not due_habits:
+        return 0
 
+    keyboard = _build_reminder_keyboard()
+    semaphore = asyncio.Semaphore(SEND_CONCURRENCY)
+    sent = 0
 
-async def _ensure_index(force: bool = False) -> None:
-    await sync_to_async(_ensure_index_sync, thread_sensitive=False)(force)
+    habits_by_chat: dict[int, list] = {}
+    for habit in due_habits:
+        habits_by_chat.setdefault(int(habit.owner.telegram_id), []).append(habit)
 
+    def _release(habits) -> None:
+        cache.delete_many([_dedupe_key(habit.id, now_hhmm, today_iso) for habit in habits])
 
-async def _get_due_habit_ids_from_index(now_hhmm: str) -> list[int]:
-    return await sync_to_async(_get_due_habit_ids_from_index_sync, thread_sensitive=False)(now_hhmm)
+    async def _send_digest(chat_id: int, habits):
+        nonlocal sent
+        habits = [habit for habit in habits if cache.add(_dedupe_key(habit.id, now_hhmm, today_iso), 1, timeout=ttl)]
+        if not habits:
+            return
+        text = _build_digest_text(habits)
 
+        async with semaphore:
+            try:
+                await bot.send_message(chat_id=chat_id, text=text, reply_markup=keyboard)
+                sent += 1
+            except TelegramRetryAfter as exc:
+                await asyncio.sleep(float(getattr(exc, "retry_after", 1)) + 0.1)
+                try:
+                    await bot.send_message(chat_id=chat_id, text=text, reply_markup=keyboard)
+                    sent += 1
+                except Exception as retry_exc:
+                    _release(habits)
+                    logger.warning(
+                        "Failed to send reminder after retry: habit_ids=%s user_id=%s telegram_id=%s error=%s",
+                        [habit.id for habit in habits],
+                        habits[0].owner_id,
+                        chat_id,
+                        retry_exc,
+                    )
+            except Exception as exc:
+                _release(habits)
+                logger.warning(
+                    "Failed to send reminder: habit_ids=%s user_id=%s telegram_id=%s error=%s",
+                    [habit.id for habit in habits],
+                    habits[0].owner_id,
+                    chat_id,
+                    exc,
+                )
 
-async def _fetch_candidate_habits_fallback():
-    queryset = Habit.objects.filter(
-        reminder=True,
-        owner__is_active=True,
-        owner__notification_habit=True,
-        owner__telegram_id__isnull=False,
-    ).select_related("owner").only(
-        "id",
-        "title",
-        "icon",
-        "goal",
-        "repeat_days",
-        "reminder_times",
-        "owner_id",
-        "owner__telegram_id",
-    )
-    return await sync_to_async(lambda: list(queryset.iterator(chunk_size=2000)))()
+    tasks = [_send_digest(chat_id, habits) for chat_id, habits in habits_by_chat.items()]
+    for i in range(0, len(tasks), GATHER_CHUNK_SIZE):
+        await asyncio.gather(*tasks[i : i + GATHER_CHUNK_SIZE])
+    return sent
 
 
-async def _fetch_habits_by_ids(habit_ids: list[int]):
-    if not habit_ids:
-        return []
-    queryset = Habit.objects.filter(
-        id__in=habit_ids,
-        reminder=True,
-        owner__is_active=True,
-        owner__notification_habit=True,
-        owner__telegram_id__isnull=False,
-    ).select_related("owner").only(
+async def _fetch_streak_risk_habits(day, shard: tuple[int, int] | None = None):
+    queryset = streak_risk_habits_queryset(day)
+    if shard is not None:
+        index, count = shard
+        queryset = queryset.annotate(owner_shard=Mod("owner_id", count)).filter(owner_shard=index)
+    queryset = queryset.select_related("owner").only(
         "id",
         "title",
         "icon",
-        "goal",
-        "repeat_days",
-        "reminder_times",
         "owner_id",
         "owner__telegram_id",
-    )
-    return await sync_to_async(lambda: list(queryset.iterator(chunk_size=2000)))()
-
+    ).order_by("owner_id", "id")
+    return await sync_to_async(lambda: list(queryset.iterator(chunk_size=5000)))()
 
-async def _fetch_today_completion_map(habit_ids: list[int]):
-    if not habit_ids:
-        return {}
-    today = timezone.localdate()
-    rows = HabitCompletion.objects.filter(habit_id__in=habit_ids, date=today).values_list("habit_id", "count")
-    pairs = await sync_to_async(list)(rows)
-    return {int(hid): int(cnt or 0) for hid, cnt in pairs}
 
-
-async def process_due_reminders(bot) -> int:
-    now = timezone.localtime()
-    now_hhmm = now.strftime("%H:%M")
-    today_weekday_ru = WEEKDAY_NAMES_RU[now.weekday()]
+async def process_streak_alerts(bot, shard: tuple[int, int] | None = None, slot=None) -> int:
+    now = timezone.localtime(slot) if slot is not None else timezone.localtime()
     today_iso = now.date().isoformat()
     ttl = _seconds_to_day_end()
-
-    habit_ids = await _get_due_habit_ids_from_index(now_hhmm)
-    if habit_ids:
-        habits = await _fetch_habits_by_ids(habit_ids)
-    else:
-        habits = await _fetch_candidate_habits_fallback()
+    habits = await _fetch_streak_risk_habits(now.date(), shard)
     if not habits:
         return 0
 
-    due_habits = [
-        habit
-        for habit in habits
-        if _is_due_time(habit.reminder_times, now_hhmm)
-        and _is_scheduled_for_today(habit.repeat_days, today_weekday_ru)
-    ]
-    if not due_habits:
-        return 0
+    habits_by_owner: dict[int, list] = {}
+    for habit in habits:
+        habits_by_owner.setdefault(habit.owner_id, []).append(habit)
 
-    completion_map = await _fetch_today_completion_map([habit.id for habit in due_habits])
     keyboard = _build_reminder_keyboard()
     semaphore = asyncio.Semaphore(SEND_CONCURRENCY)
     sent = 0
 
-    async def _send_one(habit):
+    async def _send_alert(user_id: int, habits):
         nonlocal sent
-        if completion_map.get(habit.id, 0) >= max(int(habit.goal or 1), 1):
-            return
-        key = _dedupe_key(habit.id, now_hhmm, today_iso)
+        key = _streak_alert_key(user_id, today_iso)
         if not cache.add(key, 1, timeout=ttl):
             return
-
+        chat_id = int(habits[0].owner.telegram_id)
         async with semaphore:
             try:
-                await bot.send_message(
-                    chat_id=habit.owner.telegram_id,
-                    text=_build_reminder_text(habit),
-                    reply_markup=keyboard,
-                )
+                await bot.send_message(chat_id=chat_id, text=_build_streak_alert_text(habits), reply_markup=keyboard)
                 sent += 1
-            except TelegramRetryAfter as exc:
-                await asyncio.sleep(float(getattr(exc, "retry_after", 1)) + 0.1)
-                try:
-                    await bot.send_message(
-                        chat_id=habit.owner.telegram_id,
-                        text=_build_reminder_text(habit),
-                        reply_markup=keyboard,
-                    )
-                    sent += 1
-                except Exception as retry_exc:
-                    logger.warning(
-                        "Failed to send reminder after retry: habit_id=%s user_id=%s telegram_id=%s error=%s",
-                        habit.id,
-                        habit.owner_id,
-                        habit.owner.telegram_id,
-                        retry_exc,
-                    )
             except Exception as exc:
+                cache.delete(key)
                 logger.warning(
-                    "Failed to send reminder: habit_id=%s user_id=%s telegram_id=%s error=%s",
-                    habit.id,
-                    habit.owner_id,
-                    habit.owner.telegram_id,
+                    "Failed to send streak alert: user_id=%s telegram_id=%s error=%s",
+                    user_id,
+                    chat_id,
                     exc,
                 )
 
-    tasks = [_send_one(habit) for habit in due_habits]
+    tasks = [_send_alert(user_id, habits) for user_id, habits in habits_by_owner.items()]
     for i in range(0, len(tasks), GATHER_CHUNK_SIZE):
         await asyncio.gather(*tasks[i : i + GATHER_CHUNK_SIZE])
     return sent
 
 
+async def _process_slot(bot, slot, shard: tuple[int, int] | None = None) -> int:
+    count = await process_due_reminders(bot, shard=shard, slot=slot)
+    if slot.strftime("%H:%M") == STREAK_ALERT_HHMM:
+        alerts = await process_streak_alerts(bot, shard=shard, slot=slot)
+        if alerts:
+            logger.info("Streak alerts sent: %s (shard %s)", alerts, shard)
+    return count
+
+
+def _get_redis():
+    try:
+        return get_redis_connection("default")
+    except Exception:
+        return None
+
+
+def _heartbeat(redis, worker_id: str) -> tuple[list[str], bool]:
+    now = time.time()
+    pipe = redis.pipeline(transaction=False)
+    pipe.zadd(WORKERS_KEY, {worker_id: now})
+    pipe.zremrangebyscore(WORKERS_KEY, "-inf", now - WORKER_LEASE_SECONDS)
+    pipe.zrange(WORKERS_KEY, 0, -1)
+    pipe.set(LEADER_KEY, worker_id, nx=True, ex=WORKER_LEASE_SECONDS)
+    pipe.get(LEADER_KEY)
+    _added, _pruned, members, _acquired, leader = pipe.execute()
+    members = [member.decode() if isinstance(member, bytes) else member for member in members]
+    is_leader = (leader.decode() if isinstance(leader, bytes) else leader) == worker_id
+    if is_leader:
+        redis.expire(LEADER_KEY, WORKER_LEASE_SECONDS)
+    return members, is_leader
+
+
+def _leave(redis, worker_id: str) -> None:
+    redis.zrem(WORKERS_KEY, worker_id)
+    leader = redis.get(LEADER_KEY)
+    if (leader.decode() if isinstance(leader, bytes) else leader) == worker_id:
+        redis.delete(LEADER_KEY)
+
+
+def _shard_order(members: list[str], worker_id: str) -> list[int]:
+    position = members.index(worker_id) if worker_id in members else 0
+    offset = position * REMINDER_SHARD_COUNT // max(len(members), 1)
+    return [(offset + i) % REMINDER_SHARD_COUNT for i in range(REMINDER_SHARD_COUNT)]
+
+
+async def _keep_claim(redis, key: str, worker_id: str) -> None:
+    while True:
+        await asyncio.sleep(SHARD_CLAIM_RENEW_SECONDS)
+        if not redis.eval(_RENEW_CLAIM_LUA, 1, key, worker_id, SHARD_CLAIM_TTL_SECONDS):
+            logger.warning("Lost reminder shard claim: key=%s worker=%s", key, worker_id)
+            return
+
+
+async def _process_minute_shards(bot, redis, worker_id: str, slot, members: list[str]) -> bool:
+    minute_key = slot.strftime("%Y%m%d%H%M")
+    keys = [SHARD_CLAIM_KEY.format(minute=minute_key, shard=shard) for shard in range(REMINDER_SHARD_COUNT)]
+    for shard in _shard_order(members, worker_id):
+        key = keys[shard]
+        # A claim left by a crashed worker expires and the shard is picked up on a later poll.
+        if not redis.set(key, worker_id, nx=True, ex=SHARD_CLAIM_TTL_SECONDS):
+            continue
+        renewer = asyncio.create_task(_keep_claim(redis, key, worker_id))
+        try:
+            count = await _process_slot(bot, slot, shard=(shard, REMINDER_SHARD_COUNT))
+        finally:
+            renewer.cancel()
+        if not redis.eval(_FINISH_CLAIM_LUA, 1, key, worker_id, SHARD_DONE, SHARD_DONE_TTL_SECONDS):
+            logger.warning("Reminder shard finished after its claim moved on: key=%s worker=%s", key, worker_id)
+        if count:
+            logger.info("Reminder messages sent: shard=%s count=%s worker=%s", shard, count, worker_id)
+    states = redis.mget(keys)
+    return all((state.decode() if isinstance(state, bytes) else state) == SHARD_DONE for state in states)
+
+
+def _read_last_processed(redis):
+    raw = redis.get(LAST_PROCESSED_KEY)
+    if not raw:
+        return None
+    try:
+        return timezone.localtime(datetime.fromtimestamp(int(raw), tz=dt_timezone.utc))
+    except (TypeError, ValueError):
+        return None
+
+
+def _mark_processed(redis, slot) -> None:
+    redis.eval(_MARK_PROCESSED_LUA, 1, LAST_PROCESSED_KEY, int(slot.timestamp()), LAST_PROCESSED_TTL_SECONDS)
+
+
+def _pending_slots(last_processed, current_slot) -> list:
+    if last_processed is None:
+        return [current_slot]
+    if last_processed >= current_slot:
+        return []
+    earliest = current_slot - timedelta(minutes=REMINDER_MAX_LATENESS_MINUTES)
+    start = last_processed + timedelta(minutes=1)
+    if start < earliest:
+        skipped = int((earliest - start).total_seconds() // 60)
+        logger.warning("Reminder slots skipped beyond lateness window: %s (from %s)", skipped, start)
+        start = earliest
+    slots = []
+    while start <= current_slot:
+        slots.append(start)
+        start += timedelta(minutes=1)
+    return slots
+
+
+def _report_lag(redis, slot) -> None:
+    lag = max(int((timezone.now() - slot).total_seconds()) - 60, 0)
+    if lag > 0:
+        logger.warning("Reminder dispatch lag: slot=%s lag_seconds=%s", slot.strftime("%Y-%m-%d %H:%M"), lag)
+    if redis is not None:
+        redis.set(LAG_KEY, lag, ex=LAG_TTL_SECONDS)
+
+
 async def run_reminder_loop(bot, poll_interval_seconds: int = 30) -> None:
     await _ensure_index(force=True)
-    last_processed_minute: str | None = None
+    local_last_processed = None
     while True:
         try:
-            now = timezone.localtime()
-            minute_key = now.strftime("%Y-%m-%d %H:%M")
-            if minute_key != last_processed_minute:
+            redis = _get_redis()
+            current_slot = timezone.localtime().replace(second=0, microsecond=0)
+            try:
+                last_processed = _read_last_processed(redis) if redis is not None else local_last_processed
+            except Exception:
+                redis = None
+                last_processed = local_last_processed
+            slots = _pending_slots(last_processed, current_slot)
+            if slots:
                 await _ensure_index(force=False)
-                count = await process_due_reminders(bot)
+            for slot in slots:
+                count = await _process_slot(bot, slot)
                 if count:
-                    logger.info("Habit reminders sent: %s", count)
-                last_processed_minute = minute_key
+                    logger.info("Reminder messages sent: %s (slot %s)", count, slot.strftime("%H:%M"))
+                local_last_processed = slot
+                if redis is not None:
+                    _mark_processed(redis, slot)
+                _report_lag(redis, slot)
         except asyncio.CancelledError:
             raise
         except Exception as exc:
             logger.exception("Reminder loop error: %s", exc)
         await asyncio.sleep(max(int(poll_interval_seconds), 10))
+
+
+async def run_sharded_reminder_loop(bot, worker_id: str, poll_interval_seconds: int = 5) -> None:
+    try:
+        while True:
+            try:
+                redis = _get_redis()
+                if redis is None:
+                    raise RuntimeError("Redis is required for sharded reminder workers")
+                members, is_leader = await sync_to_async(_heartbeat, thread_sensitive=False)(redis, worker_id)
+                if is_leader:
+                    await _ensure_index(force=False)
+                current_slot = timezone.localtime().replace(second=0, microsecond=0)
+                contiguous = True
+                for slot in _pending_slots(_read_last_processed(redis), current_slot):
+                    done = await _process_minute_shards(bot, redis, worker_id, slot, members)
+                    # The shared cursor only advances past slots whose shards are all done.
+                    contiguous = contiguous and done
+                    if contiguous:
+                        _mark_processed(redis, slot)
+                        _report_lag(redis, slot)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.exception("Reminder worker error: %s", exc)
+            await asyncio.sleep(max(int(poll_interval_seconds), 1))
+    finally:
+        redis = _get_redis()
+        if redis is not None:
+            try:
+                _leave(redis, worker_id)
+            except Exception:
+                pass